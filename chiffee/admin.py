@@ -1,7 +1,8 @@
 import django.contrib.auth.models
 from django.contrib import admin
 
-from .models import Deposit, Employee, Product, Purchase, User
+from .models import (Deposit, Email, Employee, LedgerEntry, Product, Purchase,
+                     PurchaseDay, User)
 
 
 # Register your models here.
@@ -10,8 +11,27 @@ class DepositAdmin(admin.ModelAdmin):
     list_display = ['user', 'amount', 'date']
 
 
+class EmailAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'subject', 'created', 'attempts', 'error']
+
+
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ['user', 'balance']
+    # Balances are only changed through purchases, deposits and cancellations
+    readonly_fields = ['balance']
+
+
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'kind', 'amount', 'date', 'key']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 class ProductAdmin(admin.ModelAdmin):
@@ -22,6 +42,10 @@ class PurchaseAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'quantity', 'total_price', 'date']
 
 
+class PurchaseDayAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'quantity', 'total_price']
+
+
 class UserAdmin(admin.ModelAdmin):
     list_display = ['username',
                     'last_name',
@@ -33,8 +57,11 @@ class UserAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Deposit, DepositAdmin)
+admin.site.register(Email, EmailAdmin)
 admin.site.register(Employee, EmployeeAdmin)
+admin.site.register(LedgerEntry, LedgerEntryAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(Purchase, PurchaseAdmin)
+admin.site.register(PurchaseDay, PurchaseDayAdmin)
 admin.site.unregister(django.contrib.auth.models.User)
 admin.site.register(User, UserAdmin)
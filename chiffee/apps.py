@@ -0,0 +1,14 @@
+import os
+
+from django.apps import AppConfig
+
+
+class ChiffeeConfig(AppConfig):
+    name = 'chiffee'
+
+    def ready(self):
+        # The metrics of every process are written there from the moment
+        # chiffee.metrics is imported
+        os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+        from . import signals  # noqa: F401
@@ -0,0 +1,206 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.middleware.csrf import get_token
+from django.shortcuts import redirect, render, reverse
+from django.views import View
+
+from .cart import get_cart_key
+from .catalog import get_catalog_grid
+from .models import Product, User
+from .views import (RedirectView, get_checkout_context, get_purchase_cart,
+                    get_purchase_context, render_pending)
+from .writer import WriterError, execute
+
+redirect_view = sync_to_async(RedirectView.as_view())
+pending_view = sync_to_async(render_pending)
+
+
+def load_user(request):
+    # The templates read the user, which would otherwise be loaded from the
+    # session inside the event loop
+    return request.user.is_authenticated
+
+
+def purchase(shopping_cart, user, url):
+    try:
+        return execute('purchase', shopping_cart, user, url)
+    finally:
+        close_old_connections()
+
+
+async def purchase_async(shopping_cart, user, url):
+    # Waiting in the writer's queue must not hold up the thread that runs the
+    # queries of all other requests
+    return await sync_to_async(
+        purchase,
+        thread_sensitive=settings.WRITER_ADDRESS is None)(shopping_cart,
+                                                          user,
+                                                          url)
+
+
+class AsyncView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Django 3.2 only awaits views that look like coroutine functions
+        return markcoroutinefunction(super().as_view(**initkwargs))
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+
+class AsyncAddToCartView(AsyncView):
+    async def post(self, request, *args, **kwargs):
+        if 'product' not in request.POST:
+            return await redirect_view(request)
+
+        if not await sync_to_async(self.add_product)(request,
+                                                     request.POST['product']):
+            return await redirect_view(request)
+
+        return redirect(reverse('chiffee:index'))
+
+    def add_product(self, request, pk):
+        try:
+            product = Product.objects.get(pk=pk, active=True)
+        except (Product.DoesNotExist, ValueError):
+            return False
+
+        request.cart.increment(get_cart_key(product))
+
+        return True
+
+
+class AsyncCheckoutView(AsyncView):
+    template_name = 'chiffee/checkout.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = await sync_to_async(self.get_context)(request,
+                                                        kwargs.get('username'))
+
+        if context is None:
+            return await redirect_view(request)
+
+        return render(request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        if 'decrease' in request.POST:
+            await sync_to_async(request.cart.decrement)(
+                request.POST['decrease'])
+        elif 'increase' in request.POST:
+            await sync_to_async(request.cart.increment)(
+                request.POST['increase'], create=False)
+        elif 'delete' in request.POST:
+            await sync_to_async(request.cart.remove)(request.POST['delete'])
+        elif 'username' in request.POST:
+            return await self.get(request, username=request.POST['username'])
+
+        return redirect(reverse('chiffee:checkout'))
+
+    def get_context(self, request, username):
+        load_user(request)
+
+        return get_checkout_context(request, username)
+
+
+class AsyncConfirmView(AsyncView):
+    async def post(self, request, *args, **kwargs):
+        if 'confirm' in request.POST:
+            if 'username' not in request.POST:
+                return redirect(reverse('chiffee:checkout'))
+
+            try:
+                user, shopping_cart = await sync_to_async(self.get_purchase)(
+                    request, request.POST['username'])
+            except User.DoesNotExist:
+                return await redirect_view(request)
+
+            if len(shopping_cart) == 0:
+                return await redirect_view(request)
+
+            try:
+                await purchase_async(shopping_cart,
+                                     user,
+                                     request.get_raw_uri().replace(
+                                         request.get_full_path(),
+                                         ''))
+            except Product.DoesNotExist:
+                return await redirect_view(request)
+            except WriterError:
+                await sync_to_async(request.cart.clear)()
+
+                return await pending_view(request)
+
+            await sync_to_async(request.cart.clear)()
+
+            return await redirect_view(request, success=True)
+        elif 'cancel' in request.POST:
+            await sync_to_async(request.cart.clear)()
+
+            return redirect(reverse('chiffee:index'))
+
+        return await redirect_view(request)
+
+    def get_purchase(self, request, username):
+        return User.objects.get(username=username), request.cart.get_items()
+
+
+class AsyncIndexView(AsyncView):
+    template_name = 'chiffee/index.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = await sync_to_async(self.get_context)(request)
+
+        return render(request, self.template_name, context)
+
+    def get_context(self, request):
+        return {'catalog_grid': get_catalog_grid(load_user(request),
+                                                 get_token(request)),
+                'shopping_cart_counter': request.cart.count()}
+
+
+class AsyncPurchaseView(AsyncView):
+    template_name = 'chiffee/purchase.html'
+
+    async def get(self, request, *args, **kwargs):
+        if 'product' not in request.GET:
+            return await redirect_view(request)
+
+        context = await sync_to_async(self.get_context)(request,
+                                                        request.GET['product'])
+
+        if context is None:
+            return await redirect_view(request)
+
+        return render(request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        shopping_cart, user = await sync_to_async(get_purchase_cart)(request)
+
+        if shopping_cart is None:
+            return await redirect_view(request)
+
+        try:
+            await purchase_async(shopping_cart,
+                                 user,
+                                 request.get_raw_uri().replace(
+                                     request.get_full_path(),
+                                     ''))
+        except Product.DoesNotExist:
+            return await redirect_view(request)
+        except WriterError:
+            await sync_to_async(request.cart.clear)()
+
+            return await pending_view(request)
+
+        await sync_to_async(request.cart.clear)()
+
+        return await redirect_view(request, success=True)
+
+    def get_context(self, request, name):
+        load_user(request)
+
+        return get_purchase_context(request, name)
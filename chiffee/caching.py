@@ -0,0 +1,34 @@
+import secrets
+
+from django.core.cache import cache
+
+
+def bump_version(name):
+    version = secrets.token_hex(8)
+    cache.set(f'{name}-version', version, None)
+
+    return version
+
+
+def get_version(name):
+    version = cache.get(f'{name}-version')
+
+    if version is None:
+        version = bump_version(name)
+
+    return version
+
+
+def get_versioned(name, build, timeout=None, variant=None):
+    key = f'{name}-{get_version(name)}'
+
+    if variant is not None:
+        key = f'{key}-{variant}'
+
+    value = cache.get(key)
+
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+
+    return value
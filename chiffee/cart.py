@@ -0,0 +1,296 @@
+import asyncio
+import secrets
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+CART_COOKIE_NAME = 'cart'
+CART_SALT = 'chiffee.cart'
+
+
+class CartLine:
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        self.total_price = product.price * quantity
+
+
+class PricedCart:
+    def __init__(self, lines, stale):
+        self.lines = lines
+        self.stale = stale
+        self.total = sum(line.total_price for line in lines)
+
+
+def get_cart_key(product):
+    return str(product.pk)
+
+
+def price_cart(shopping_cart):
+    pks = [int(key) for key in shopping_cart if key.isdigit()]
+    products = Product.objects.filter(pk__in=pks, active=True).order_by(
+        'category', 'name')
+    lines = [CartLine(product, shopping_cart[get_cart_key(product)])
+             for product in products]
+    priced = {get_cart_key(line.product) for line in lines}
+    stale = [key for key in shopping_cart if key not in priced]
+
+    return PricedCart(lines, stale)
+
+
+class CartStore:
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+
+    def get_items(self):
+        raise NotImplementedError()
+
+    def count(self):
+        raise NotImplementedError()
+
+    def increment(self, key, create=True):
+        raise NotImplementedError()
+
+    def decrement(self, key):
+        raise NotImplementedError()
+
+    def remove(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def save(self, response):
+        pass
+
+
+class SignedCookieCartStore(CartStore):
+    def __init__(self, request):
+        super().__init__(request)
+
+        try:
+            self.cart = signing.loads(
+                request.COOKIES.get(CART_COOKIE_NAME, ''),
+                salt=CART_SALT,
+                max_age=settings.CART_TIMEOUT)
+        except signing.BadSignature:
+            self.cart = {'count': 0, 'lines': {}}
+
+    def get_items(self):
+        return dict(self.cart['lines'])
+
+    def count(self):
+        return self.cart['count']
+
+    def increment(self, key, create=True):
+        lines = self.cart['lines']
+
+        if not key.isdigit() or (not create and key not in lines):
+            return None
+
+        lines[key] = lines.get(key, 0) + 1
+        self.cart['count'] += 1
+        self.modified = True
+
+        return lines[key]
+
+    def decrement(self, key):
+        lines = self.cart['lines']
+
+        if key not in lines:
+            return None
+
+        lines[key] -= 1
+        self.cart['count'] -= 1
+        self.modified = True
+
+        if lines[key] == 0:
+            lines.pop(key)
+
+            return 0
+
+        return lines[key]
+
+    def remove(self, key):
+        if key not in self.cart['lines']:
+            return
+
+        self.cart['count'] -= self.cart['lines'].pop(key)
+        self.modified = True
+
+    def clear(self):
+        self.cart = {'count': 0, 'lines': {}}
+        self.modified = True
+
+    def save(self, response):
+        if not self.modified:
+            return
+
+        if self.cart['count'] == 0:
+            response.delete_cookie(CART_COOKIE_NAME)
+        else:
+            response.set_cookie(CART_COOKIE_NAME,
+                                signing.dumps(self.cart, salt=CART_SALT),
+                                max_age=settings.CART_TIMEOUT,
+                                httponly=True,
+                                samesite='Lax')
+
+
+class CacheCartStore(CartStore):
+    def __init__(self, request):
+        super().__init__(request)
+        self.cache = caches[settings.CART_CACHE]
+        self.cart_id = request.get_signed_cookie(CART_COOKIE_NAME,
+                                                 None,
+                                                 salt=CART_SALT)
+
+        if self.cart_id is None:
+            self.cart_id = secrets.token_hex(16)
+
+    def get_cache_key(self, name):
+        return f'cart-{self.cart_id}-{name}'
+
+    def get_keys(self):
+        return self.cache.get(self.get_cache_key('keys'), [])
+
+    def get_items(self):
+        keys = self.get_keys()
+        quantities = self.cache.get_many([self.get_cache_key(f'line-{key}')
+                                          for key in keys])
+
+        return {key: quantities[self.get_cache_key(f'line-{key}')]
+                for key in keys
+                if quantities.get(self.get_cache_key(f'line-{key}'), 0) > 0}
+
+    def count(self):
+        return self.cache.get(self.get_cache_key('count'), 0)
+
+    def increment(self, key, create=True):
+        if not key.isdigit():
+            return None
+
+        line = self.get_cache_key(f'line-{key}')
+
+        if create and self.cache.add(line, 0, settings.CART_TIMEOUT):
+            self.set_keys(self.get_keys() + [key])
+
+        try:
+            quantity = self.cache.incr(line)
+        except ValueError:
+            return None
+
+        self.change_count(1)
+
+        return quantity
+
+    def decrement(self, key):
+        if key not in self.get_keys():
+            return None
+
+        try:
+            quantity = self.cache.decr(self.get_cache_key(f'line-{key}'))
+        except ValueError:
+            return None
+
+        self.change_count(-1)
+
+        if quantity <= 0:
+            self.cache.delete(self.get_cache_key(f'line-{key}'))
+            self.set_keys([other for other in self.get_keys() if other != key])
+
+        return max(quantity, 0)
+
+    def remove(self, key):
+        if key not in self.get_keys():
+            return
+
+        line = self.get_cache_key(f'line-{key}')
+        quantity = self.cache.get(line, 0)
+        self.cache.delete(line)
+        self.set_keys([other for other in self.get_keys() if other != key])
+        self.change_count(-quantity)
+
+    def clear(self):
+        self.cache.delete_many([self.get_cache_key(f'line-{key}')
+                                for key in self.get_keys()]
+                               + [self.get_cache_key('keys'),
+                                  self.get_cache_key('count')])
+        self.modified = True
+
+    def set_keys(self, keys):
+        self.cache.set(self.get_cache_key('keys'), keys, settings.CART_TIMEOUT)
+        self.modified = True
+
+    def change_count(self, amount):
+        key = self.get_cache_key('count')
+        self.cache.add(key, 0, settings.CART_TIMEOUT)
+
+        try:
+            self.cache.incr(key, amount)
+        except ValueError:
+            self.cache.set(key, max(amount, 0), settings.CART_TIMEOUT)
+
+        self.modified = True
+
+    def save(self, response):
+        if not self.modified:
+            return
+
+        # Every change extends the lifetime of the whole cart
+        for key in self.get_keys():
+            self.cache.touch(self.get_cache_key(f'line-{key}'),
+                             settings.CART_TIMEOUT)
+
+        self.cache.touch(self.get_cache_key('keys'), settings.CART_TIMEOUT)
+        self.cache.touch(self.get_cache_key('count'), settings.CART_TIMEOUT)
+        response.set_signed_cookie(CART_COOKIE_NAME,
+                                   self.cart_id,
+                                   salt=CART_SALT,
+                                   max_age=settings.CART_TIMEOUT,
+                                   httponly=True,
+                                   samesite='Lax')
+
+
+def get_cart_store(request):
+    return import_string(settings.CART_STORE)(request)
+
+
+class CartMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        # Lets Django await the middleware instead of running it in a thread
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        request.cart = SimpleLazyObject(lambda: get_cart_store(request))
+        response = self.get_response(request)
+
+        # The store is only created when the cart was used
+        if request.cart._wrapped is not empty:
+            request.cart.save(response)
+
+        return response
+
+    async def __acall__(self, request):
+        request.cart = SimpleLazyObject(lambda: get_cart_store(request))
+        response = await self.get_response(request)
+
+        if request.cart._wrapped is not empty:
+            await sync_to_async(request.cart.save)(response)
+
+        return response
@@ -0,0 +1,47 @@
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import bump_version, get_versioned
+from .models import CATEGORIES, Product
+
+CATALOG_CACHE = 'catalog'
+CATALOG_TIMEOUT = 24 * 60 * 60
+CSRF_TOKEN_PLACEHOLDER = 'csrf-token-placeholder'
+
+
+def build_catalog():
+    catalog = [(category, name, []) for category, name in CATEGORIES]
+    categories = {category: products for category, name, products in catalog}
+
+    for product in Product.objects.filter(active=True).order_by('category',
+                                                                'name'):
+        categories[product.category].append(product)
+
+    return catalog
+
+
+def get_catalog():
+    return get_versioned(CATALOG_CACHE, build_catalog, CATALOG_TIMEOUT)
+
+
+def get_catalog_grid(authenticated, csrf_token):
+    def build_catalog_grid():
+        catalog = get_catalog()
+        context = {'authenticated': authenticated,
+                   'catalog': catalog,
+                   'categories': CATEGORIES,
+                   'csrf_token': CSRF_TOKEN_PLACEHOLDER,
+                   'empty': not any(products for _, _, products in catalog)}
+
+        return render_to_string('chiffee/catalog-grid.html', context)
+
+    grid = get_versioned(CATALOG_CACHE,
+                         build_catalog_grid,
+                         CATALOG_TIMEOUT,
+                         f'grid-{int(authenticated)}')
+
+    return mark_safe(grid.replace(CSRF_TOKEN_PLACEHOLDER, str(csrf_token)))
+
+
+def invalidate_catalog():
+    bump_version(CATALOG_CACHE)
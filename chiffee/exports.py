@@ -0,0 +1,102 @@
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8',
+                  'ndjson': 'application/x-ndjson'}
+
+DEPOSIT_COLUMNS = (('id', 'pk'),
+                   ('date', 'date'),
+                   ('username', 'user__username'),
+                   ('first_name', 'user__first_name'),
+                   ('last_name', 'user__last_name'),
+                   ('amount', 'amount'))
+PURCHASE_COLUMNS = (('id', 'pk'),
+                    ('date', 'date'),
+                    ('key', 'key'),
+                    ('username', 'user__username'),
+                    ('first_name', 'user__first_name'),
+                    ('last_name', 'user__last_name'),
+                    ('product', 'product__name'),
+                    ('quantity', 'quantity'),
+                    ('total_price', 'total_price'))
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_formatter(value):
+    if isinstance(value, datetime):
+        tz = timezone.get_current_timezone()
+
+        return lambda date: date.astimezone(tz).isoformat()
+
+    if isinstance(value, Decimal):
+        return str
+
+    return None
+
+
+def iterate_rows(queryset, columns):
+    rows = queryset.order_by('date', 'pk').values_list(
+        *[field for _, field in columns]).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE)
+    formatters = None
+
+    for row in rows:
+        if formatters is None:
+            formatters = [get_formatter(value) for value in row]
+
+        yield [value if formatter is None or value is None
+               else formatter(value)
+               for formatter, value in zip(formatters, row)]
+
+
+def batch_lines(lines):
+    batch = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) == EXPORT_CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+
+    if len(batch) > 0:
+        yield ''.join(batch)
+
+
+def stream_csv(queryset, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+    yield from batch_lines(writer.writerow(row)
+                           for row in iterate_rows(queryset, columns))
+
+
+def stream_ndjson(queryset, columns):
+    names = [name for name, _ in columns]
+    yield from batch_lines(
+        json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+        for row in iterate_rows(queryset, columns))
+
+
+def export(queryset, columns, name, export_format):
+    if export_format == 'csv':
+        content = stream_csv(queryset, columns)
+    else:
+        content = stream_ndjson(queryset, columns)
+
+    response = StreamingHttpResponse(
+        content,
+        content_type=EXPORT_FORMATS[export_format])
+    filename = f'{name}-{timezone.localdate():%Y%m%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
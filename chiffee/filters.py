@@ -3,28 +3,34 @@ from django import forms
 from django.contrib.auth.models import User
 from django_filters import widgets
 
-from .models import Product, Purchase
+from .forms import UserSearchWidget
+from .models import Deposit, Product, Purchase
+from .search import search_purchases
 
 
-def get_full_names():
-    full_names = ()
-    users = User.objects.all().order_by('last_name', 'first_name')
-
-    for user in users:
-        full_names += (user.pk, f'{user.last_name}, {user.first_name}'),
+class DateRangeWidget(widgets.RangeWidget):
+    template_name = 'chiffee/date-range-widget.html'
 
-    return full_names
 
+class DepositFilter(django_filters.FilterSet):
+    username = django_filters.ModelChoiceFilter(field_name='user',
+                                                queryset=User.objects.all())
+    date_from_to = django_filters.DateFromToRangeFilter(field_name='date')
 
-class DateRangeWidget(widgets.RangeWidget):
-    template_name = 'chiffee/date-range-widget.html'
+    class Meta:
+        model = Deposit
+        fields = ['user', 'date']
 
 
 class PurchaseFilter(django_filters.FilterSet):
-    username = django_filters.ChoiceFilter(
+    search = django_filters.CharFilter(
+        method='filter_search',
+        widget=forms.TextInput(attrs={'id': 'grid-search-text',
+                                      'type': 'search'}))
+    username = django_filters.ModelChoiceFilter(
         field_name='user',
-        choices=get_full_names(),
-        widget=forms.Select(attrs={'id': 'grid-search-username'}))
+        queryset=User.objects.all(),
+        widget=UserSearchWidget(attrs={'id': 'grid-search-username'}))
     product = django_filters.ModelChoiceFilter(
         field_name='product',
         queryset=Product.objects.all(),
@@ -40,3 +46,6 @@ class PurchaseFilter(django_filters.FilterSet):
     class Meta:
         model = Purchase
         fields = ['user', 'product', 'date']
+
+    def filter_search(self, queryset, name, value):
+        return search_purchases(queryset, value)
@@ -1,16 +1,105 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
 from django import forms
 
 from .models import Product, User
+from .pictures import PICTURE_MAX_BYTES, PICTURE_MAX_PIXELS
+from .usersearch import get_user_search_index
+
+
+class UserSearchWidget(forms.Widget):
+    template_name = 'chiffee/user-search-widget.html'
+
+    def __init__(self, attrs=None, active=False):
+        super().__init__(attrs)
+        self.active = active
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = None
+
+        if value not in (None, ''):
+            try:
+                label = get_user_search_index().get_label(int(value))
+            except (TypeError, ValueError):
+                pass
+
+        context['widget']['active'] = self.active
+        context['widget']['label'] = label
+
+        return context
 
 
 class DepositForm(forms.Form):
     user = forms.ModelChoiceField(queryset=User.objects.filter(is_active=True),
                                   label='Benutzer',
-                                  empty_label='')
+                                  widget=UserSearchWidget(active=True))
     deposit = forms.DecimalField(initial=0,
                                  label='Anzahlung')
 
 
+class DepositImportForm(forms.Form):
+    file = forms.FileField(label='CSV-Datei',
+                           widget=forms.FileInput(attrs={'accept': '.csv'}))
+
+    def clean_file(self):
+        try:
+            content = self.cleaned_data['file'].read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise forms.ValidationError('Die Datei ist nicht UTF-8-kodiert.')
+
+        first_line = content.split('\n', 1)[0]
+        delimiter = ';' if ';' in first_line and ',' not in first_line else ','
+        rows = [row for row in csv.reader(io.StringIO(content),
+                                          delimiter=delimiter)
+                if len(row) > 0]
+
+        if len(rows) > 0 and rows[0][0].strip().lower() == 'username':
+            rows = rows[1:]
+
+        if len(rows) == 0:
+            raise forms.ValidationError(
+                'Die Datei enthält keine Einzahlungen.')
+
+        users = User.objects.filter(
+            username__in=[row[0].strip() for row in rows],
+            is_active=True).in_bulk(field_name='username')
+        deposits = []
+
+        for line, row in enumerate(rows, 1):
+            deposit = {'line': line,
+                       'username': row[0].strip(),
+                       'user': users.get(row[0].strip()),
+                       'amount': None,
+                       'error': None}
+            deposits.append(deposit)
+
+            if len(row) != 2:
+                deposit['error'] = 'Erwartet: Benutzername und Betrag'
+                continue
+
+            try:
+                amount = Decimal(row[1].replace('€', '').replace(',', '.'))
+            except InvalidOperation:
+                amount = None
+
+            if (amount is None or not amount.is_finite() or amount == 0
+                    or amount.as_tuple().exponent < -2
+                    or abs(amount) >= 10 ** 7):
+                deposit['error'] = 'Ungültiger Betrag'
+            elif deposit['user'] is None:
+                deposit['error'] = 'Unbekannter Benutzer'
+
+            if deposit['error'] is None:
+                amount = amount.quantize(Decimal('0.01'))
+
+            deposit['amount'] = amount
+
+        return deposits
+
+
 class ActiveProductsForm(forms.Form):
     product = forms.ModelChoiceField(
         queryset=Product.objects.filter(active=True).order_by('category',
@@ -35,3 +124,19 @@ class PictureForm(forms.Form):
                                       'onchange': 'form.submit();'}),
         label='',
         required=False)
+
+    def clean_picture(self):
+        picture = self.cleaned_data['picture']
+
+        if picture is None:
+            return picture
+
+        if picture.size > PICTURE_MAX_BYTES:
+            raise forms.ValidationError('Das Bild ist zu groß.')
+
+        width, height = picture.image.size
+
+        if width * height > PICTURE_MAX_PIXELS:
+            raise forms.ValidationError('Das Bild hat zu viele Pixel.')
+
+        return picture
@@ -0,0 +1,83 @@
+import logging
+from datetime import timedelta
+
+import ldap
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils import timezone
+from django_auth_ldap.backend import LDAPBackend
+
+from .models import Credential
+
+logger = logging.getLogger('ldapauth')
+
+UNAVAILABLE_ERRORS = (ldap.SERVER_DOWN, ldap.TIMEOUT, ldap.CONNECT_ERROR)
+
+
+class DirectoryUnavailable(Exception):
+    pass
+
+
+def get_credential(username):
+    return Credential.objects.select_related('user').filter(
+        user__username=username).first()
+
+
+def raise_directory_unavailable(sender, context, exception, **kwargs):
+    if isinstance(exception, UNAVAILABLE_ERRORS):
+        raise DirectoryUnavailable() from exception
+
+
+class CachedLDAPBackend(LDAPBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not username or not password:
+            return None
+
+        credential = get_credential(username)
+        age = None
+
+        if (credential is not None
+                and check_password(password, credential.password)):
+            age = timezone.now() - credential.verified
+
+            if age < timedelta(seconds=settings.AUTH_LDAP_CACHE_TIMEOUT):
+                return self.get_cached_user(credential)
+
+        try:
+            user = super().authenticate(request, username, password, **kwargs)
+        except DirectoryUnavailable:
+            if (age is not None and age < timedelta(
+                    seconds=settings.LDAP_OFFLINE_GRACE_PERIOD)):
+                logger.warning(f'LDAP server unavailable, {username} was '
+                               f'verified against the local credential.')
+
+                return self.get_cached_user(credential)
+
+            logger.warning(f'LDAP server unavailable, {username} could not '
+                           f'be verified.')
+
+            return None
+
+        if user is None:
+            # The password was changed or the account was removed
+            if age is not None:
+                credential.delete()
+
+            return None
+
+        if age is not None:
+            credential.verified = timezone.now()
+            credential.save(update_fields=['verified'])
+        else:
+            Credential.objects.update_or_create(
+                user_id=user.pk,
+                defaults={'password': make_password(password),
+                          'verified': timezone.now()})
+
+        return user
+
+    def get_cached_user(self, credential):
+        if not self.user_can_authenticate(credential.user):
+            return None
+
+        return credential.user
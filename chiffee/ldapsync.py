@@ -0,0 +1,287 @@
+import logging
+
+import ldap
+import ldif
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+from ldap.controls import SimplePagedResultsControl
+from ldap.filter import escape_filter_chars
+
+from .models import DirectorySync, User
+
+logger = logging.getLogger('syncldap')
+
+PAGE_SIZE = 500
+USER_FIELDS = ('first_name', 'last_name', 'email')
+USER_FILTER = '(objectClass=posixAccount)'
+GROUP_FILTER = '(objectClass=posixGroup)'
+
+
+def get_value(entry, attribute):
+    values = entry.get(attribute)
+
+    if not values:
+        return ''
+
+    return values[0].decode('UTF-8')
+
+
+def get_user_attributes():
+    attribute_map = settings.AUTH_LDAP_USER_ATTR_MAP
+
+    return {field: attribute_map[field]
+            for field in ('username',) + USER_FIELDS}
+
+
+def get_sync_timestamp():
+    return DirectorySync.objects.values_list('timestamp', flat=True).first()
+
+
+def get_groups_dn():
+    return f'{settings.AUTH_LDAP_OU_GROUPS},{settings.AUTH_LDAP_BASE_DN}'
+
+
+def get_admin_group():
+    return settings.AUTH_LDAP_CN_ADMINS.split('=', 1)[-1]
+
+
+class LDAPDirectory:
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.connection = ldap.initialize(settings.AUTH_LDAP_SERVER_URI)
+        self.connection.set_option(ldap.OPT_REFERRALS, 0)
+
+        if settings.AUTH_LDAP_START_TLS:
+            self.connection.start_tls_s()
+
+        self.connection.simple_bind_s(settings.AUTH_LDAP_BIND_DN,
+                                      settings.AUTH_LDAP_BIND_PASSWORD)
+
+    def close(self):
+        self.connection.unbind_s()
+
+    def search(self, base, filterstr, attributes):
+        control = SimplePagedResultsControl(True,
+                                            size=self.page_size,
+                                            cookie='')
+
+        while True:
+            message_id = self.connection.search_ext(base,
+                                                    ldap.SCOPE_SUBTREE,
+                                                    filterstr,
+                                                    attributes,
+                                                    serverctrls=[control])
+            _, entries, _, controls = self.connection.result3(message_id)
+
+            for dn, entry in entries:
+                if dn is not None:
+                    yield entry
+
+            cookies = [response.cookie for response in controls
+                       if response.controlType ==
+                       SimplePagedResultsControl.controlType]
+
+            if len(cookies) == 0 or not cookies[0]:
+                break
+
+            control.cookie = cookies[0]
+
+    def get_users(self, attributes, since=None):
+        filterstr = USER_FILTER
+
+        if since is not None:
+            filterstr = (f'(&{USER_FILTER}'
+                         f'(modifyTimestamp>={escape_filter_chars(since)}))')
+
+        return self.search(settings.AUTH_LDAP_BASE_DN, filterstr, attributes)
+
+    def get_groups(self):
+        return self.search(get_groups_dn(), GROUP_FILTER, ['cn', 'memberUid'])
+
+
+class LDIFDirectory:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            parser = ldif.LDIFRecordList(file)
+            parser.parse()
+
+        self.entries = [
+            (dn.lower(),
+             {attribute: values for attribute, values in entry.items()},
+             {value.decode('UTF-8').lower()
+              for value in entry.get('objectClass', [])})
+            for dn, entry in parser.all_records]
+
+    def close(self):
+        pass
+
+    def find(self, base, object_class, attributes):
+        for dn, entry, object_classes in self.entries:
+            if dn.endswith(base.lower()) and object_class in object_classes:
+                yield {attribute: entry[attribute]
+                       for attribute in attributes + ['modifyTimestamp']
+                       if attribute in entry}
+
+    def get_users(self, attributes, since=None):
+        for entry in self.find(settings.AUTH_LDAP_BASE_DN,
+                               'posixaccount',
+                               attributes):
+            if since is None or get_value(entry, 'modifyTimestamp') >= since:
+                yield entry
+
+    def get_groups(self):
+        return self.find(get_groups_dn(), 'posixgroup', ['cn', 'memberUid'])
+
+
+class SyncResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.deactivated = 0
+        self.groups_added = 0
+        self.groups_removed = 0
+        self.timestamp = None
+
+    def __str__(self):
+        return (f'{self.created} users created, {self.updated} updated, '
+                f'{self.deactivated} deactivated, {self.groups_added} group '
+                f'memberships added, {self.groups_removed} removed')
+
+
+def get_directory_state(directory, since):
+    attributes = get_user_attributes()
+    username_attribute = attributes['username']
+    changed = {}
+    latest = None
+
+    for entry in directory.get_users(list(attributes.values()) +
+                                     ['modifyTimestamp'],
+                                     since):
+        username = get_value(entry, username_attribute)
+        changed[username] = {field: get_value(entry, attribute)
+                             for field, attribute in attributes.items()
+                             if field != 'username'}
+        timestamp = get_value(entry, 'modifyTimestamp')
+
+        if latest is None or timestamp > latest:
+            latest = timestamp
+
+    if since is None:
+        usernames = set(changed)
+    else:
+        usernames = {get_value(entry, username_attribute)
+                     for entry in directory.get_users([username_attribute])}
+
+    members = {}
+
+    for entry in directory.get_groups():
+        members[get_value(entry, 'cn')] = {
+            value.decode('UTF-8') for value in entry.get('memberUid', [])}
+
+    return changed, usernames, members, latest
+
+
+def sync_users(directory, since=None):
+    changed, usernames, members, latest = get_directory_state(directory,
+                                                              since)
+    result = SyncResult()
+    result.timestamp = latest
+    admins = members.get(get_admin_group(), set())
+
+    with transaction.atomic():
+        mirrored = {group.name: group for group in Group.objects.filter(
+            name__in=settings.AUTH_LDAP_MIRROR_GROUPS)}
+
+        for name in settings.AUTH_LDAP_MIRROR_GROUPS:
+            if name in members and name not in mirrored:
+                mirrored[name] = Group.objects.create(name=name)
+
+        users = {user.username: user
+                 for user in User.objects.order_by()}
+        new_users = []
+        updated_users = []
+
+        for username in usernames:
+            fields = changed.get(username)
+            user = users.get(username)
+            is_admin = username in admins
+
+            if user is None:
+                if fields is None:
+                    continue
+
+                logger.info(f'Adding new user {username}...')
+                new_users.append(User(username=username,
+                                      password=make_password(None),
+                                      is_active=True,
+                                      is_staff=is_admin,
+                                      is_superuser=is_admin,
+                                      **fields))
+                continue
+
+            updates = {'is_active': True,
+                       'is_staff': is_admin,
+                       'is_superuser': is_admin}
+
+            if fields is not None:
+                updates.update(fields)
+
+            if any(getattr(user, field) != value
+                   for field, value in updates.items()):
+                for field, value in updates.items():
+                    setattr(user, field, value)
+
+                updated_users.append(user)
+
+        for user in users.values():
+            # Local accounts like the superuser have a usable password
+            if (user.is_active and user.username not in usernames
+                    and not user.has_usable_password()):
+                user.is_active = False
+                updated_users.append(user)
+                result.deactivated += 1
+                logger.info(f'User {user.username} was set to inactive.')
+
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update(updated_users,
+                                 USER_FIELDS + ('is_active',
+                                                'is_staff',
+                                                'is_superuser'),
+                                 batch_size=PAGE_SIZE)
+        result.created = len(new_users)
+        result.updated = len(updated_users) - result.deactivated
+
+        user_ids = dict(User.objects.filter(
+            username__in=usernames).order_by().values_list('username', 'pk'))
+        Membership = User.groups.through
+        current = {(user_id, group_id): pk
+                   for pk, user_id, group_id in Membership.objects.filter(
+                       group__in=mirrored.values()).values_list('pk',
+                                                                'user_id',
+                                                                'group_id')}
+        wanted = {(user_ids[username], group.pk)
+                  for name, group in mirrored.items()
+                  for username in members.get(name, ())
+                  if username in user_ids}
+        synced = set(user_ids.values())
+        added = wanted - current.keys()
+        removed = [pk for (user_id, group_id), pk in current.items()
+                   if user_id in synced and (user_id, group_id) not in wanted]
+
+        Membership.objects.bulk_create([Membership(user_id=user_id,
+                                                   group_id=group_id)
+                                        for user_id, group_id in added])
+        Membership.objects.filter(pk__in=removed).delete()
+
+        result.groups_added = len(added)
+        result.groups_removed = len(removed)
+
+        # Stored with the changes, so a failed sync is fetched again
+        if latest is not None and not DirectorySync.objects.filter(
+                pk=1).update(timestamp=latest, date=timezone.now()):
+            DirectorySync.objects.create(pk=1, timestamp=latest)
+
+    return result
@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import BalanceSnapshot, Employee, LedgerEntry
+
+SNAPSHOT_BATCH_SIZE = 400
+
+
+def round_total(total):
+    # Sums of decimals are computed with floats on SQLite
+    return Decimal(total or 0).quantize(Decimal('0.01'))
+
+
+def get_balance(user, date=None):
+    date = date if date is not None else timezone.now()
+    snapshot = BalanceSnapshot.objects.filter(
+        user=user, date__lte=date).order_by('-date').first()
+    entries = LedgerEntry.objects.filter(user=user, date__lte=date)
+    balance = Decimal(0)
+
+    if snapshot is not None:
+        entries = entries.filter(pk__gt=snapshot.last_entry)
+        balance = snapshot.balance
+
+    total = entries.order_by().aggregate(total=Sum('amount'))['total']
+
+    return balance + round_total(total)
+
+
+def get_balances_before(date):
+    boundary = BalanceSnapshot.objects.filter(date__lt=date).aggregate(
+        last=Max('last_entry'))['last'] or 0
+    latest = BalanceSnapshot.objects.filter(
+        last_entry__lte=boundary).order_by().values('user').annotate(
+        last=Max('pk')).values('last')
+    balances = dict(BalanceSnapshot.objects.filter(
+        pk__in=latest).values_list('user', 'balance'))
+    rows = LedgerEntry.objects.filter(
+        pk__gt=boundary, date__lt=date).order_by().values('user').annotate(
+        total=Sum('amount')).values_list('user', 'total')
+
+    for user, total in rows:
+        balances[user] = balances.get(user, 0) + round_total(total)
+
+    return balances
+
+
+def get_mismatches():
+    rows = Employee.objects.annotate(
+        ledger=Sum('user__ledgerentry__amount')).order_by().values_list(
+        'user__username', 'balance', 'ledger')
+    mismatches = []
+
+    for username, balance, ledger in rows:
+        if balance != round_total(ledger):
+            mismatches.append((username, balance, round_total(ledger)))
+
+    return mismatches
+
+
+def get_latest_snapshots(users):
+    latest = BalanceSnapshot.objects.filter(user__in=users).order_by().values(
+        'user').annotate(last=Max('pk')).values('last')
+
+    return dict(BalanceSnapshot.objects.filter(pk__in=latest).values_list(
+        'user', 'balance'))
+
+
+def take_snapshots():
+    with transaction.atomic():
+        start = BalanceSnapshot.objects.aggregate(
+            last=Max('last_entry'))['last'] or 0
+        end = LedgerEntry.objects.aggregate(last=Max('pk'))['last']
+
+        if end is None or end <= start:
+            return 0
+
+        # All snapshots of a run share the same last entry, so the next run
+        # only has to read the entries written since then
+        changes = dict(LedgerEntry.objects.filter(
+            pk__gt=start, pk__lte=end).order_by().values('user').annotate(
+            total=Sum('amount')).values_list('user', 'total'))
+        users = list(changes)
+        now = timezone.now()
+        snapshots = []
+
+        for i in range(0, len(users), SNAPSHOT_BATCH_SIZE):
+            batch = users[i:i + SNAPSHOT_BATCH_SIZE]
+            previous = get_latest_snapshots(batch)
+
+            for user in batch:
+                balance = previous.get(user, 0) + round_total(changes[user])
+                snapshots.append(BalanceSnapshot(user_id=user,
+                                                 balance=balance,
+                                                 last_entry=end,
+                                                 date=now))
+
+        BalanceSnapshot.objects.bulk_create(snapshots,
+                                            batch_size=SNAPSHOT_BATCH_SIZE)
+
+    return len(snapshots)
@@ -0,0 +1,265 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import (override_settings, setup_databases,
+                               teardown_databases)
+from django.utils import timezone
+
+from chiffee.metrics import QueryTimer
+from chiffee.models import Product, Purchase, Statement, User
+from chiffee.statements import generate_statements
+from chiffee.urls import urlpatterns
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def get_percentile(values, percentile):
+    values = sorted(values)
+
+    return values[max(math.ceil(percentile / 100 * len(values)) - 1, 0)]
+
+
+def get_scenarios(product, user, key, statement):
+    return [
+        ('add-to-cart', 'kiosk', 'post', '/add-to-cart/',
+         {'product': product.pk}),
+        ('admin-accounts', 'admin', 'get', '/admin/accounts/', {}),
+        ('admin-deposits', 'admin', 'get', '/admin/deposits/', {}),
+        ('admin-deposits', 'admin', 'post', '/admin/deposits/',
+         {'user': user.pk, 'deposit': '10'}),
+        ('admin-deposits-export', 'admin', 'get', '/admin/deposits/export/',
+         {'format': 'ndjson', 'username': user.pk}),
+        ('admin-deposits-import', 'admin', 'get', '/admin/deposits/import/',
+         {}),
+        ('admin-products', 'admin', 'get', '/admin/products/', {}),
+        ('admin-purchases', 'admin', 'get', '/admin/purchases/', {}),
+        ('admin-purchases', 'admin', 'get', '/admin/purchases/',
+         {'product': product.pk}),
+        ('admin-purchases', 'admin', 'get', '/admin/purchases/',
+         {'search': user.last_name}),
+        ('admin-purchases-export', 'admin', 'get',
+         '/admin/purchases/export/', {'product': product.pk}),
+        ('admin-purchases-history', 'admin', 'get',
+         '/admin/purchases/history/', {}),
+        ('cancel-purchase', 'kiosk', 'get', f'/cancel-purchase/{key}/', {}),
+        ('checkout', 'kiosk', 'get', '/checkout/', {}),
+        ('confirm', 'kiosk', 'post', '/confirm/',
+         {'confirm': '', 'username': user.username}),
+        ('index', 'kiosk', 'get', '/', {}),
+        ('login', 'anonymous', 'get', '/login/', {}),
+        ('logout', 'user', 'get', '/logout/', {}),
+        ('metrics', 'admin', 'get', '/metrics/', {}),
+        ('profile', 'user', 'get', '/profile/', {}),
+        ('profile-history', 'user', 'get', '/profile/history/', {}),
+        ('purchase', 'kiosk', 'get', '/purchase/', {'product': product.name}),
+        ('purchase', 'kiosk', 'post', '/purchase/',
+         {'product': product.name, 'username': user.username}),
+        ('redirect', 'kiosk', 'get', '/redirect/', {}),
+        ('statement', 'user', 'get', f'/statements/{statement.pk}.html', {}),
+        ('user-search', 'admin', 'get', '/users/search/',
+         {'q': user.last_name[:3]}),
+    ]
+
+
+def get_missing_pages(scenarios):
+    return ({pattern.name for pattern in urlpatterns} -
+            {scenario[0] for scenario in scenarios})
+
+
+def get_scenario_label(name, method, data):
+    label = f'{method.upper()} {name}'
+
+    if method == 'get' and len(data) > 0:
+        label += f' ({", ".join(data)})'
+
+    return label
+
+
+class Command(BaseCommand):
+    help = ('Measure latency and SQL queries of every page against seeded '
+            'databases of different sizes and compare them to a baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes',
+                            default='1000,10000,100000',
+                            help='Comma-separated numbers of purchases')
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--requests',
+                            type=int,
+                            default=20,
+                            help='Measured requests per page')
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument('--save',
+                            action='store_true',
+                            help='Store the results as the new baseline')
+        parser.add_argument('--threshold',
+                            type=float,
+                            default=1.5,
+                            help='Allowed slowdown factor of the p95 latency')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        results = {}
+        old_config = setup_databases(verbosity=0,
+                                     interactive=False,
+                                     aliases=['default'])
+        media_root = tempfile.mkdtemp()
+
+        try:
+            with override_settings(CACHES=CACHES,
+                                   ALLOWED_HOSTS=['*'],
+                                   DEBUG=False,
+                                   MEDIA_ROOT=media_root):
+                for size in sizes:
+                    call_command('seedload',
+                                 clear=True,
+                                 users=options['users'],
+                                 products=options['products'],
+                                 purchases=size,
+                                 deposits=size // 20,
+                                 seed=options['seed'])
+                    results[str(size)] = self._run(options['requests'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(media_root)
+
+        self._print(results)
+
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+
+            with open(options['baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+            self.stdout.write(f'Saved baseline to {options["baseline"]}.')
+        elif os.path.exists(options['baseline']):
+            self._compare(results, options['baseline'], options['threshold'])
+
+    def _get_clients(self, product, user):
+        admin, _ = User.objects.get_or_create(username='benchmark-admin',
+                                              is_staff=True,
+                                              is_superuser=True)
+        clients = {'anonymous': Client(),
+                   'admin': Client(),
+                   'kiosk': Client(),
+                   'user': Client()}
+        clients['admin'].force_login(admin)
+        clients['user'].force_login(user)
+
+        for _ in range(3):
+            clients['kiosk'].post('/add-to-cart/', {'product': product.pk})
+
+        return clients
+
+    def _run(self, requests):
+        product = Product.objects.filter(active=True).order_by('pk').first()
+        purchase = Purchase.objects.order_by('-date').first()
+        user = purchase.user
+        clients = self._get_clients(product, user)
+        month = timezone.localdate(purchase.date).replace(day=1)
+        generate_statements(month, workers=1)
+        statement = Statement.objects.get(user=user, month=month)
+        scenarios = get_scenarios(product, user, purchase.key, statement)
+        missing = get_missing_pages(scenarios)
+
+        if len(missing) > 0:
+            raise CommandError(f'No benchmark for {", ".join(missing)}.')
+
+        results = {}
+
+        for name, client_name, method, path, data in scenarios:
+            client = clients[client_name]
+            latencies = []
+            queries = []
+            sql_times = []
+
+            for i in range(requests + 1):
+                if client_name == 'user':
+                    client.force_login(user)
+
+                timer = QueryTimer()
+
+                with transaction.atomic():
+                    with connection.execute_wrapper(timer):
+                        start = time.perf_counter()
+                        response = getattr(client, method)(path, data)
+
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+
+                        latency = time.perf_counter() - start
+
+                    transaction.set_rollback(True)
+
+                if response.status_code >= 400:
+                    raise CommandError(f'{method.upper()} {path} returned '
+                                       f'{response.status_code}.')
+
+                # The first request only warms up caches
+                if i > 0:
+                    latencies.append(latency * 1000)
+                    queries.append(timer.count)
+                    sql_times.append(timer.time * 1000)
+
+            results[get_scenario_label(name, method, data)] = {
+                'p50_ms': round(get_percentile(latencies, 50), 2),
+                'p95_ms': round(get_percentile(latencies, 95), 2),
+                'queries': max(queries),
+                'sql_ms': round(get_percentile(sql_times, 50), 2)}
+
+        return results
+
+    def _print(self, results):
+        for size, pages in results.items():
+            self.stdout.write(f'{size} purchases')
+
+            for page, result in pages.items():
+                self.stdout.write(f'  {page:40} '
+                                  f'p50 {result["p50_ms"]:8.2f} ms  '
+                                  f'p95 {result["p95_ms"]:8.2f} ms  '
+                                  f'{result["queries"]:3} queries  '
+                                  f'SQL {result["sql_ms"]:8.2f} ms')
+
+    def _compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+        regressions = []
+
+        for size, pages in results.items():
+            for page, result in pages.items():
+                expected = baseline.get(size, {}).get(page)
+
+                if expected is None:
+                    continue
+
+                if result['queries'] > expected['queries']:
+                    regressions.append(f'{page} at {size} purchases: '
+                                       f'{result["queries"]} queries instead '
+                                       f'of {expected["queries"]}')
+
+                if result['p95_ms'] > expected['p95_ms'] * threshold:
+                    regressions.append(f'{page} at {size} purchases: '
+                                       f'p95 {result["p95_ms"]} ms instead '
+                                       f'of {expected["p95_ms"]} ms')
+
+        if len(regressions) > 0:
+            for regression in regressions:
+                self.stderr.write(regression)
+
+            raise CommandError(f'{len(regressions)} regressions found.')
+
+        self.stdout.write('No regressions found.')
@@ -0,0 +1,237 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from chiffee.models import Product, User
+
+from .benchmark import get_percentile
+from .stresspurchases import CACHES, PROFILES, run_writer, use_database
+
+FORM = 'application/x-www-form-urlencoded'
+MODES = ('wsgi', 'asgi')
+
+
+def get_kiosk_requests(product, username):
+    return [('get', '/', ''),
+            ('post', '/add-to-cart/', urlencode({'product': product})),
+            ('post', '/add-to-cart/', urlencode({'product': product})),
+            ('get', '/checkout/', ''),
+            ('post', '/confirm/', urlencode({'confirm': '',
+                                             'username': username}))]
+
+
+def get_response(client, method, path, data):
+    if method == 'post':
+        return client.post(path, data, content_type=FORM)
+
+    return client.get(path)
+
+
+def run_wsgi(workers, clients, iterations, products, usernames, seed):
+    # Every worker thread of a WSGI server handles one request at a time
+    slots = threading.Semaphore(workers)
+    latencies = []
+    errors = []
+
+    def run_kiosk(number):
+        generator = random.Random(seed + number)
+        client = Client()
+
+        for _ in range(iterations):
+            for method, path, data in get_kiosk_requests(
+                    generator.choice(products), generator.choice(usernames)):
+                start = time.perf_counter()
+
+                with slots:
+                    response = get_response(client, method, path, data)
+
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                if response.status_code >= 400:
+                    errors.append(path)
+
+    threads = [threading.Thread(target=run_kiosk, args=(number,))
+               for number in range(clients)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return latencies, errors
+
+
+def run_asgi(clients, iterations, products, usernames, seed):
+    latencies = []
+    errors = []
+
+    async def run_kiosk(number):
+        generator = random.Random(seed + number)
+        client = AsyncClient()
+
+        for _ in range(iterations):
+            for method, path, data in get_kiosk_requests(
+                    generator.choice(products), generator.choice(usernames)):
+                start = time.perf_counter()
+                response = await get_response(client, method, path, data)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                if response.status_code >= 400:
+                    errors.append(path)
+
+    async def run_kiosks():
+        await asyncio.gather(*(run_kiosk(number)
+                               for number in range(clients)))
+
+    asyncio.run(run_kiosks())
+
+    return latencies, errors
+
+
+def run_load(mode, database, address, options, products, usernames):
+    use_database(database)
+
+    with override_settings(ALLOWED_HOSTS=['*'],
+                           CACHES=CACHES,
+                           DEBUG=False,
+                           WRITER_ADDRESS=address):
+        start = time.perf_counter()
+
+        if mode == 'wsgi':
+            latencies, errors = run_wsgi(options['workers'],
+                                         options['clients'],
+                                         options['iterations'],
+                                         products,
+                                         usernames,
+                                         options['seed'])
+        else:
+            latencies, errors = run_asgi(options['clients'],
+                                         options['iterations'],
+                                         products,
+                                         usernames,
+                                         options['seed'])
+
+        duration = time.perf_counter() - start
+
+    connections.close_all()
+
+    return latencies, errors, duration
+
+
+class Command(BaseCommand):
+    help = ('Simulate many kiosks buying at once and compare the WSGI setup '
+            'with threaded workers to a single ASGI process with async views')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients',
+                            type=int,
+                            default=50,
+                            help='Number of kiosks buying at the same time')
+        parser.add_argument('--iterations',
+                            type=int,
+                            default=5,
+                            help='Purchases per kiosk')
+        parser.add_argument('--workers',
+                            type=int,
+                            default=4,
+                            help='Number of WSGI worker threads')
+        parser.add_argument('--profile',
+                            choices=sorted(PROFILES),
+                            default='production',
+                            help='Database profile')
+        parser.add_argument('--writer',
+                            action='store_true',
+                            help='Commit the purchases in a single writer '
+                                 'process')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        original = dict(connections['default'].settings_dict)
+        directory = tempfile.mkdtemp()
+
+        try:
+            for mode in MODES:
+                self._run(mode, directory, options)
+        finally:
+            use_database(original)
+            shutil.rmtree(directory)
+
+    def _run(self, mode, directory, options):
+        database = {**PROFILES[options['profile']],
+                    'NAME': os.path.join(directory, f'{mode}.sqlite3')}
+        use_database(database)
+
+        with override_settings(CACHES=CACHES):
+            call_command('migrate', verbosity=0)
+            call_command('seedload',
+                         users=options['users'],
+                         products=options['products'],
+                         purchases=options['users'] * 10,
+                         deposits=options['users'],
+                         seed=options['seed'])
+
+        products = list(Product.objects.filter(active=True).values_list(
+            'pk', flat=True))
+        usernames = list(User.objects.filter(
+            employee__isnull=False).values_list('username', flat=True))
+        connections.close_all()
+        address = None
+        writer = None
+
+        if options['writer']:
+            address = os.path.join(directory, f'{mode}.socket')
+            ready = multiprocessing.Event()
+            writer = multiprocessing.Process(target=run_writer,
+                                             args=(database, address, ready),
+                                             daemon=True)
+            writer.start()
+
+            if not ready.wait(10):
+                raise CommandError('The writer did not start.')
+
+        # The URLs are chosen from ASYNC_VIEWS when the settings are loaded,
+        # so every mode runs in a freshly started process
+        os.environ['ASYNC_VIEWS'] = str(mode == 'asgi')
+
+        try:
+            with ProcessPoolExecutor(
+                    1,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup) as executor:
+                latencies, errors, duration = executor.submit(
+                    run_load,
+                    mode,
+                    database,
+                    address,
+                    options,
+                    products,
+                    usernames).result()
+        finally:
+            del os.environ['ASYNC_VIEWS']
+
+            if writer is not None:
+                writer.terminate()
+                writer.join()
+
+        self.stdout.write(f'{mode}: {len(latencies)} requests, '
+                          f'{len(errors)} errors, '
+                          f'{len(latencies) / duration:.0f} requests/s, '
+                          f'p50 {get_percentile(latencies, 50):.2f} ms, '
+                          f'p95 {get_percentile(latencies, 95):.2f} ms')
@@ -0,0 +1,155 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chiffee.exports import DEPOSIT_COLUMNS, PURCHASE_COLUMNS, iterate_rows
+from chiffee.filters import PurchaseFilter
+from chiffee.ledger import get_balance
+from chiffee.models import (CATEGORIES, Deposit, Product, Purchase,
+                            PurchaseDay, User)
+from chiffee.outbox import get_pending_emails
+from chiffee.pagination import encode_cursor, get_keyset_page
+from chiffee.purchases import generate_key
+
+FULL_SCAN = re.compile(
+    r'^SCAN (TABLE )?(?P<table>\w+)(?!.*(USING|VIRTUAL TABLE))')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def get_hot_queries(user, product):
+    now = timezone.now()
+    purchase = Purchase(user=user, product=product, date=now, pk=1)
+    cursor = encode_cursor(purchase)
+    today = timezone.localdate(now)
+    month_ago = today - timedelta(days=30)
+
+    def get_purchases_page(data, **kwargs):
+        return get_keyset_page(PurchaseFilter(data).qs, **kwargs)
+
+    return [
+        ('cancel purchase',
+         False,
+         lambda: list(Purchase.objects.filter(key='0' * 64))),
+        ('generate key', False, generate_key),
+        ('profile history',
+         True,
+         lambda: get_keyset_page(Purchase.objects.filter(user=user))),
+        ('profile history (older)',
+         True,
+         lambda: get_keyset_page(Purchase.objects.filter(user=user),
+                                 after=cursor)),
+        ('profile history (newer)',
+         True,
+         lambda: get_keyset_page(Purchase.objects.filter(user=user),
+                                 before=cursor)),
+        ('purchase search', True, lambda: get_purchases_page({})),
+        ('purchase search (older)',
+         True,
+         lambda: get_purchases_page({}, after=cursor)),
+        ('purchase search by product',
+         True,
+         lambda: get_purchases_page({'product': product.pk})),
+        ('purchase search by product (older)',
+         True,
+         lambda: get_purchases_page({'product': product.pk}, after=cursor)),
+        ('purchase search by text',
+         False,
+         lambda: get_purchases_page({'search': user.username})),
+        ('purchase search by date range',
+         True,
+         lambda: get_purchases_page({'date_range': 'month'})),
+        ('purchase search by dates',
+         True,
+         lambda: get_purchases_page({'date_from_to_min': month_ago,
+                                     'date_from_to_max': today})),
+        ('purchase export',
+         True,
+         lambda: list(iterate_rows(PurchaseFilter({}).qs, PURCHASE_COLUMNS))),
+        ('deposit export',
+         True,
+         lambda: list(iterate_rows(Deposit.objects.all(), DEPOSIT_COLUMNS))),
+        ('daily totals',
+         False,
+         lambda: list(PurchaseDay.objects.filter(user__in=[user],
+                                                 date__in=[today]))),
+        ('deposit history',
+         True,
+         lambda: list(Deposit.objects.filter(user=user)[:10])),
+        ('balance at date',
+         False,
+         lambda: get_balance(user, now - timedelta(days=30))),
+        ('product by name',
+         False,
+         lambda: list(Product.objects.filter(name=product.name))),
+        ('pending emails', False, get_pending_emails),
+    ]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def find_problems(plan, paged):
+    problems = []
+
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+
+        if match is not None:
+            problems.append(f'full scan of {match.group("table")}')
+        elif detail.startswith(TEMP_SORT) and paged:
+            problems.append('sort without index')
+
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Check that the hot queries of the app are served by indexes '
+            'instead of full table scans')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans can only be checked on SQLite.')
+
+        failures = 0
+
+        with transaction.atomic():
+            user = User.objects.create(username='checkqueryplans')
+            product = Product.objects.create(name='checkqueryplans',
+                                             price=0,
+                                             category=CATEGORIES[0][0])
+
+            for name, paged, run in get_hot_queries(user, product):
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+
+                for query in queries.captured_queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+
+                    plan = explain(query['sql'])
+                    problems = find_problems(plan, paged)
+
+                    if len(problems) > 0:
+                        failures += 1
+                        self.stderr.write(f'{name}: {", ".join(problems)}')
+                        self.stderr.write(f'    {query["sql"]}')
+
+                        for detail in plan:
+                            self.stderr.write(f'    {detail}')
+                    elif options['verbosity'] > 1:
+                        self.stdout.write(f'{name}: {"; ".join(plan)}')
+
+            transaction.set_rollback(True)
+
+        if failures > 0:
+            raise CommandError(f'{failures} queries do not use an index.')
+
+        self.stdout.write('All hot queries use indexes.')
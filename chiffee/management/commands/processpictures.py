@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from chiffee.pictures import get_pending_pictures, process_picture
+from chiffee.roster import invalidate_roster
+
+logger = logging.getLogger('pictures')
+
+
+class Command(BaseCommand):
+    help = 'Resize uploaded profile pictures into all sizes and formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=20,
+                            help='Maximum number of pictures per poll')
+        parser.add_argument('--loop',
+                            action='store_true',
+                            help='Keep running and poll for new pictures')
+        parser.add_argument('--interval',
+                            type=float,
+                            default=5,
+                            help='Seconds to wait between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            employees = get_pending_pictures(options['batch_size'])
+            processed = sum(process_picture(employee)
+                            for employee in employees)
+
+            if len(employees) > 0:
+                invalidate_roster()
+
+            if processed > 0:
+                logger.info(f'Processed {processed} of {len(employees)} '
+                            f'pictures.')
+
+            if len(employees) < options['batch_size']:
+                if not options['loop']:
+                    break
+
+                time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from chiffee.models import Purchase, PurchaseDay
+
+logger = logging.getLogger('rebuildpurchasedays')
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily purchase totals from all purchases'
+
+    def handle(self, *args, **options):
+        rows = Purchase.objects.annotate(day=TruncDate('date')).values(
+            'user', 'day').annotate(quantity=Sum('quantity'),
+                                    total_price=Sum('total_price')).order_by()
+        purchase_days = []
+        count = 0
+
+        with transaction.atomic():
+            PurchaseDay.objects.all().delete()
+
+            for row in rows.iterator():
+                purchase_days.append(
+                    PurchaseDay(user_id=row['user'],
+                                date=row['day'],
+                                quantity=row['quantity'],
+                                total_price=row['total_price']))
+
+                if len(purchase_days) == BATCH_SIZE:
+                    count += len(PurchaseDay.objects.bulk_create(purchase_days))
+                    purchase_days = []
+
+            count += len(PurchaseDay.objects.bulk_create(purchase_days))
+
+        logger.info(f'Rebuilt {count} daily purchase totals.')
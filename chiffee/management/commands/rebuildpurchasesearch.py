@@ -0,0 +1,18 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chiffee.search import rebuild_purchase_search
+
+logger = logging.getLogger('rebuildpurchasesearch')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of all purchases'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_purchase_search()
+
+        logger.info(f'Indexed {count} purchases.')
@@ -0,0 +1,49 @@
+import logging
+import os
+from multiprocessing.connection import Client
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chiffee.writer import Writer, get_authkey
+
+logger = logging.getLogger('writer')
+
+
+class Command(BaseCommand):
+    help = ('Commit the purchases, deposits and cancellations of all workers '
+            'in groups from a single process listening on WRITER_ADDRESS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=100,
+                            help='Maximum number of commands per transaction')
+        parser.add_argument('--delay',
+                            type=float,
+                            default=0,
+                            help='Seconds to wait for more commands before '
+                                 'committing')
+
+    def handle(self, *args, **options):
+        address = settings.WRITER_ADDRESS
+
+        if address is None:
+            raise CommandError('WRITER_ADDRESS is not set.')
+
+        if os.path.exists(address):
+            try:
+                Client(address, 'AF_UNIX', authkey=get_authkey()).close()
+            except OSError:
+                # Left behind by a writer that did not shut down cleanly
+                os.unlink(address)
+            else:
+                raise CommandError(f'A writer is already listening on '
+                                   f'{address}.')
+
+        logger.info(f'Listening on {address}.')
+
+        try:
+            Writer(address, options['batch_size'], options['delay']).serve()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,324 @@
+import logging
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import django.contrib.auth.models
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from chiffee.catalog import invalidate_catalog
+from chiffee.models import (CATEGORIES, DEPOSIT_ENTRY, PURCHASE_ENTRY, Deposit,
+                            Employee, LedgerEntry, Product, Purchase,
+                            PurchaseDay, User)
+from chiffee.roster import ROLES, invalidate_roster
+from chiffee.usersearch import invalidate_user_search
+
+logger = logging.getLogger('seedload')
+
+FIRST_NAMES = ['Anna', 'Ben', 'Clara', 'David', 'Emma', 'Felix', 'Greta',
+               'Hannah', 'Jan', 'Jonas', 'Julia', 'Lara', 'Leon', 'Lukas',
+               'Marie', 'Max', 'Mia', 'Niklas', 'Paul', 'Sophie', 'Tim',
+               'Tom', 'Zoe', 'Özlem', 'Jürgen', 'Björn', 'Søren', 'Ines']
+LAST_NAMES = ['Bauer', 'Becker', 'Fischer', 'Hartmann', 'Hoffmann', 'Koch',
+              'Krüger', 'Lange', 'Meyer', 'Müller', 'Neumann', 'Richter',
+              'Schäfer', 'Schmidt', 'Schmitz', 'Schneider', 'Schröder',
+              'Schulz', 'Wagner', 'Weber', 'Werner', 'Wolf', 'Zimmermann']
+PRODUCT_NAMES = {1: ['Kaffee', 'Espresso', 'Cappuccino', 'Mate', 'Cola',
+                     'Wasser', 'Saft', 'Tee', 'Limo', 'Kakao'],
+                 2: ['Schokoriegel', 'Kekse', 'Chips', 'Brezel', 'Nüsse',
+                     'Gummibärchen', 'Müsliriegel', 'Waffeln', 'Croissant'],
+                 3: ['Eis am Stiel', 'Eiswaffel', 'Sorbet', 'Eisbecher']}
+ROLE_WEIGHTS = [1, 6, 3]
+# Share of the daily purchases made in each hour of the day
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 6, 10, 7, 5,
+                9, 8, 6, 8, 6, 4, 2, 1, 1, 0, 0, 0]
+WEEKDAY_WEIGHTS = [1, 1, 1, 1, 0.9, 0.1, 0.05]
+CART_SIZES = [1, 2, 3, 4]
+CART_SIZE_WEIGHTS = [70, 20, 7, 3]
+QUANTITY_WEIGHTS = [85, 10, 4, 1]
+USERNAME_PREFIX = 'seed'
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date {value}, expected YYYY-MM-DD.')
+
+
+@contextmanager
+def keep_dates(model):
+    field = model._meta.get_field('date')
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a large synthetic dataset for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--purchases', type=int, default=1000000)
+        parser.add_argument('--deposits', type=int, default=50000)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument('--end-date',
+                            help='Day after the seeded history as YYYY-MM-DD, '
+                                 'defaults to today')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument('--clear',
+                            action='store_true',
+                            help='Delete previously seeded users and products')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['end_date'] is not None:
+            end_date = parse_date(options['end_date'])
+        else:
+            end_date = timezone.localdate()
+
+        if options['clear']:
+            self._clear()
+        elif User.objects.filter(
+                username__startswith=f'{USERNAME_PREFIX}-').exists():
+            raise CommandError('The database is already seeded, '
+                               'use --clear to replace the seeded data.')
+
+        users = self._create_users(options['users'])
+        products = self._create_products(options['products'])
+        balances = self._create_history(users,
+                                        products,
+                                        options['purchases'],
+                                        options['deposits'],
+                                        options['days'],
+                                        end_date)
+        self._create_employees(balances)
+
+        invalidate_catalog()
+        invalidate_roster()
+        invalidate_user_search()
+
+    def _clear(self):
+        with transaction.atomic():
+            User.objects.filter(
+                username__startswith=f'{USERNAME_PREFIX}-').delete()
+            Product.objects.filter(
+                name__startswith=f'{USERNAME_PREFIX}-').delete()
+
+        logger.info('Deleted previously seeded data.')
+
+    def _create_users(self, count):
+        groups = [Group.objects.get_or_create(name=role)[0] for role in ROLES]
+        users = []
+
+        for i in range(count):
+            users.append(User(username=f'{USERNAME_PREFIX}-{i:06d}',
+                              first_name=self.rng.choice(FIRST_NAMES),
+                              last_name=self.rng.choice(LAST_NAMES),
+                              email=f'{USERNAME_PREFIX}-{i:06d}@example.org',
+                              is_active=self.rng.random() > 0.05))
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+            user_ids = list(User.objects.filter(
+                username__startswith=f'{USERNAME_PREFIX}-').order_by(
+                'username').values_list('pk', flat=True))
+            memberships = [
+                django.contrib.auth.models.User.groups.through(
+                    user_id=user_id,
+                    group_id=self.rng.choices(groups,
+                                              weights=ROLE_WEIGHTS)[0].pk)
+                for user_id in user_ids]
+            django.contrib.auth.models.User.groups.through.objects.bulk_create(
+                memberships, batch_size=self.batch_size)
+
+        logger.info(f'Created {len(user_ids)} users.')
+
+        return user_ids
+
+    def _create_products(self, count):
+        products = []
+
+        for i in range(count):
+            category = self.rng.choice(CATEGORIES)[0]
+            name = self.rng.choice(PRODUCT_NAMES[category])
+            price = Decimal(self.rng.randrange(30, 350, 10)) / 100
+            products.append(Product(name=f'{USERNAME_PREFIX}-{name} {i:03d}',
+                                    price=price,
+                                    category=category,
+                                    active=self.rng.random() > 0.1))
+
+        Product.objects.bulk_create(products, batch_size=self.batch_size)
+        products = list(Product.objects.filter(
+            name__startswith=f'{USERNAME_PREFIX}-').order_by('pk').values_list(
+            'pk', 'price'))
+
+        logger.info(f'Created {len(products)} products.')
+
+        return products
+
+    def _create_history(self, users, products, purchases_total,
+                        deposits_total, days, end_date):
+        # A few products sell much better than the rest
+        product_weights = []
+        cumulative = 0
+
+        for i in range(len(products)):
+            cumulative += 1 / (i + 1)
+            product_weights.append(cumulative)
+
+        user_weights = []
+        cumulative = 0
+
+        for _ in users:
+            cumulative += self.rng.paretovariate(1.5)
+            user_weights.append(cumulative)
+
+        dates = [end_date - timedelta(days=days - day) for day in range(days)]
+        day_weights = [WEEKDAY_WEIGHTS[date.weekday()] for date in dates]
+        average_cart_size = (
+                sum(size * weight for size, weight in
+                    zip(CART_SIZES, CART_SIZE_WEIGHTS)) /
+                sum(CART_SIZE_WEIGHTS))
+        carts_per_weight = (purchases_total / average_cart_size /
+                            sum(day_weights))
+        deposits_per_weight = deposits_total / sum(day_weights)
+
+        balances = {user_id: Decimal(0) for user_id in users}
+        purchases = []
+        purchase_days = []
+        deposits = []
+        entries = []
+        purchases_count = 0
+        deposits_count = 0
+
+        with keep_dates(Deposit):
+            for date, weight in zip(dates, day_weights):
+                carts = self._get_count(carts_per_weight * weight)
+                day_totals = {}
+
+                if date == dates[-1]:
+                    carts = max(carts, purchases_total - purchases_count)
+
+                for created in self._get_times(date, carts):
+                    user_id = self.rng.choices(users,
+                                               cum_weights=user_weights)[0]
+                    key = f'{self.rng.getrandbits(256):064x}'
+                    size = self.rng.choices(CART_SIZES,
+                                            weights=CART_SIZE_WEIGHTS)[0]
+                    cart = set()
+                    cart_total = 0
+
+                    while len(cart) < min(size, len(products)):
+                        cart.add(self.rng.choices(
+                            range(len(products)),
+                            cum_weights=product_weights)[0])
+
+                    for product in cart:
+                        if purchases_count >= purchases_total:
+                            break
+
+                        product_id, price = products[product]
+                        quantity = self.rng.choices(
+                            CART_SIZES, weights=QUANTITY_WEIGHTS)[0]
+                        purchases.append(Purchase(user_id=user_id,
+                                                  product_id=product_id,
+                                                  quantity=quantity,
+                                                  total_price=price * quantity,
+                                                  date=created,
+                                                  key=key))
+                        balances[user_id] -= price * quantity
+                        cart_total += price * quantity
+                        purchases_count += 1
+                        totals = day_totals.setdefault(user_id, [0, 0])
+                        totals[0] += quantity
+                        totals[1] += price * quantity
+
+                    if cart_total > 0:
+                        entries.append(LedgerEntry(user_id=user_id,
+                                                   kind=PURCHASE_ENTRY,
+                                                   amount=-cart_total,
+                                                   date=created,
+                                                   key=key))
+
+                for created in self._get_times(
+                        date,
+                        self._get_count(deposits_per_weight * weight)):
+                    if deposits_count >= deposits_total:
+                        break
+
+                    user_id = self.rng.choices(users,
+                                               cum_weights=user_weights)[0]
+                    amount = Decimal(self.rng.choice([5, 10, 10, 20, 20, 50]))
+                    deposits.append(Deposit(user_id=user_id,
+                                            amount=amount,
+                                            date=created))
+                    entries.append(LedgerEntry(user_id=user_id,
+                                               kind=DEPOSIT_ENTRY,
+                                               amount=amount,
+                                               date=created))
+                    balances[user_id] += amount
+                    deposits_count += 1
+
+                for user_id, (quantity, total_price) in day_totals.items():
+                    purchase_days.append(PurchaseDay(user_id=user_id,
+                                                     date=date,
+                                                     quantity=quantity,
+                                                     total_price=total_price))
+
+                purchases = self._flush(Purchase, purchases)
+                purchase_days = self._flush(PurchaseDay, purchase_days)
+                deposits = self._flush(Deposit, deposits)
+                entries = self._flush(LedgerEntry, entries)
+
+            self._flush(Purchase, purchases, force=True)
+            self._flush(PurchaseDay, purchase_days, force=True)
+            self._flush(Deposit, deposits, force=True)
+            self._flush(LedgerEntry, entries, force=True)
+
+        logger.info(f'Created {purchases_count} purchases and '
+                    f'{deposits_count} deposits.')
+
+        return balances
+
+    def _create_employees(self, balances):
+        employees = [Employee(user_id=user_id, balance=balance)
+                     for user_id, balance in balances.items()]
+        Employee.objects.bulk_create(employees, batch_size=self.batch_size)
+
+    def _flush(self, model, instances, force=False):
+        if len(instances) < self.batch_size and not force:
+            return instances
+
+        with transaction.atomic():
+            model.objects.bulk_create(instances, batch_size=self.batch_size)
+
+        return []
+
+    def _get_count(self, expected):
+        count = int(expected)
+
+        if self.rng.random() < expected - count:
+            count += 1
+
+        return count
+
+    def _get_times(self, date, count):
+        hours = self.rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+        seconds = sorted(hour * 3600 + self.rng.randrange(3600)
+                         for hour in hours)
+        midnight = timezone.make_aware(datetime.combine(date, time()))
+
+        return [midnight + timedelta(seconds=second) for second in seconds]
@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from chiffee.outbox import deliver_emails, get_pending_emails
+
+logger = logging.getLogger('outbox')
+
+
+class Command(BaseCommand):
+    help = 'Send queued email notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=100,
+                            help='Maximum number of emails per connection')
+        parser.add_argument('--loop',
+                            action='store_true',
+                            help='Keep running and poll the outbox')
+        parser.add_argument('--interval',
+                            type=float,
+                            default=5,
+                            help='Seconds to wait between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            emails = get_pending_emails(options['batch_size'])
+            sent = deliver_emails(emails)
+
+            if sent > 0:
+                logger.info(f'Sent {sent} of {len(emails)} emails.')
+
+            if len(emails) < options['batch_size']:
+                if not options['loop']:
+                    break
+
+                time.sleep(options['interval'])
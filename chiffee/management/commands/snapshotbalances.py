@@ -0,0 +1,15 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from chiffee.ledger import take_snapshots
+
+logger = logging.getLogger('snapshotbalances')
+
+
+class Command(BaseCommand):
+    help = ('Store the balance of every user whose ledger changed since the '
+            'last snapshot')
+
+    def handle(self, *args, **options):
+        logger.info(f'Stored {take_snapshots()} balance snapshots.')
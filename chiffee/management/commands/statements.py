@@ -0,0 +1,51 @@
+import logging
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chiffee.statements import generate_statements
+
+logger = logging.getLogger('statements')
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month {value}, expected YYYY-MM.')
+
+
+class Command(BaseCommand):
+    help = 'Write the monthly statements of all users to MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month',
+                            help='Month as YYYY-MM, defaults to the last '
+                                 'month')
+        parser.add_argument('--workers',
+                            type=int,
+                            help='Number of rendering processes, defaults to '
+                                 'the number of CPUs')
+        parser.add_argument('--force',
+                            action='store_true',
+                            help='Rewrite statements whose data did not '
+                                 'change')
+        parser.add_argument('--email',
+                            action='store_true',
+                            help='Queue the written statements for email')
+
+    def handle(self, *args, **options):
+        if options['month'] is not None:
+            month = parse_month(options['month'])
+        else:
+            this_month = timezone.localdate().replace(day=1)
+            month = date.fromordinal(this_month.toordinal() - 1).replace(
+                day=1)
+
+        count = generate_statements(month,
+                                    options['workers'],
+                                    options['force'],
+                                    options['email'])
+
+        logger.info(f'Wrote {count} statements for {month:%m/%Y}.')
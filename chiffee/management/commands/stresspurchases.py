@@ -0,0 +1,198 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Event, Process
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from chiffee.ledger import get_mismatches
+from chiffee.models import Product, Purchase, User
+from chiffee.writer import Writer, execute
+
+from .benchmark import get_percentile
+
+PROFILES = {'default': {'ENGINE': 'django.db.backends.sqlite3'},
+            'production': {'ENGINE': 'chiffee.sqlite3'}}
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+URL = 'http://localhost'
+
+
+def use_database(database):
+    connections.close_all()
+    connections.settings['default'] = dict(database)
+
+    try:
+        del connections['default']
+    except AttributeError:
+        pass
+
+
+def run_writer(database, address, ready):
+    django.setup()
+    use_database(database)
+
+    with override_settings(CACHES=CACHES):
+        Writer(address, 100, 0).serve(ready)
+
+
+def run_purchases(database, address, users, products, count, seed):
+    use_database(database)
+    generator = random.Random(seed)
+    users = list(User.objects.filter(pk__in=users))
+    latencies = []
+    errors = 0
+
+    with override_settings(CACHES=CACHES, WRITER_ADDRESS=address):
+        for _ in range(count):
+            quantity = generator.randint(1, 3)
+            shopping_cart = {generator.choice(products): quantity}
+            start = time.perf_counter()
+
+            try:
+                execute('purchase',
+                        shopping_cart,
+                        generator.choice(users),
+                        URL)
+            except OperationalError:
+                errors += 1
+
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    connections.close_all()
+
+    return errors, latencies
+
+
+class Command(BaseCommand):
+    help = ('Buy products from several processes at once against temporary '
+            'SQLite databases and count the lock errors of each profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles',
+                            default='default,production',
+                            help='Comma-separated database profiles')
+        parser.add_argument('--workers',
+                            type=int,
+                            default=8,
+                            help='Number of purchasing processes')
+        parser.add_argument('--purchases',
+                            type=int,
+                            default=200,
+                            help='Purchases per process')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--writer',
+                            action='store_true',
+                            help='Also buy through a single writer process '
+                                 'for every profile')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'].split(',')
+
+        for profile in profiles:
+            if profile not in PROFILES:
+                raise CommandError(f'Unknown profile {profile}.')
+
+        original = dict(connections['default'].settings_dict)
+        directory = tempfile.mkdtemp()
+        results = {}
+        runs = [(profile, False) for profile in profiles]
+
+        if options['writer']:
+            runs += [(profile, True) for profile in profiles]
+
+        try:
+            for profile, writer in runs:
+                name = f'{profile}+writer' if writer else profile
+                database = {**PROFILES[profile],
+                            'NAME': os.path.join(directory,
+                                                 f'{name}.sqlite3')}
+                address = (os.path.join(directory, f'{name}.socket')
+                           if writer else None)
+                results[name] = self._run(name, database, address, options)
+        finally:
+            use_database(original)
+            shutil.rmtree(directory)
+
+        for name, (errors, _) in results.items():
+            if name.startswith('production') and errors > 0:
+                raise CommandError(f'Purchases failed with {name}.')
+
+    def _run(self, name, database, address, options):
+        use_database(database)
+
+        with override_settings(CACHES=CACHES):
+            call_command('migrate', verbosity=0)
+            call_command('seedload',
+                         users=options['users'],
+                         products=options['products'],
+                         purchases=options['users'] * 10,
+                         deposits=options['users'],
+                         seed=options['seed'])
+
+        users = list(User.objects.filter(
+            employee__isnull=False).values_list('pk', flat=True))
+        products = [str(pk) for pk in Product.objects.filter(
+            active=True).values_list('pk', flat=True)]
+        purchases = Purchase.objects.count()
+        workers = options['workers']
+        connections.close_all()
+        writer = None
+
+        if address is not None:
+            ready = Event()
+            writer = Process(target=run_writer,
+                             args=(database, address, ready),
+                             daemon=True)
+            writer.start()
+
+            if not ready.wait(10):
+                raise CommandError('The writer did not start.')
+
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(workers,
+                                 initializer=django.setup) as executor:
+            results = list(executor.map(
+                run_purchases,
+                [database] * workers,
+                [address] * workers,
+                [users] * workers,
+                [products] * workers,
+                [options['purchases']] * workers,
+                [options['seed'] + i for i in range(workers)]))
+
+        duration = time.perf_counter() - start
+
+        if writer is not None:
+            writer.terminate()
+            writer.join()
+
+        errors = sum(result[0] for result in results)
+        latencies = [latency for result in results for latency in result[1]]
+        succeeded = len(latencies) - errors
+        written = Purchase.objects.count() - purchases
+        mismatches = len(get_mismatches())
+
+        self.stdout.write(f'{name}: '
+                          f'{succeeded}/{len(latencies)} purchases, '
+                          f'{errors} lock errors, '
+                          f'{succeeded / duration:.0f} purchases/s, '
+                          f'p50 {get_percentile(latencies, 50):.2f} ms, '
+                          f'p95 {get_percentile(latencies, 95):.2f} ms')
+
+        if written < succeeded or mismatches > 0:
+            raise CommandError(f'{written} purchase rows for {succeeded} '
+                               f'purchases, {mismatches} balances do not '
+                               f'match the ledger.')
+
+        return errors, latencies
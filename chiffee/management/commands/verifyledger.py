@@ -0,0 +1,24 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chiffee.ledger import get_mismatches
+
+logger = logging.getLogger('verifyledger')
+
+
+class Command(BaseCommand):
+    help = 'Check that every balance equals the sum of its ledger entries'
+
+    def handle(self, *args, **options):
+        mismatches = get_mismatches()
+
+        for username, balance, ledger in mismatches:
+            self.stderr.write(f'{username}: balance {balance}, '
+                              f'ledger {ledger}')
+
+        if len(mismatches) > 0:
+            raise CommandError(f'{len(mismatches)} balances do not match '
+                               f'the ledger.')
+
+        self.stdout.write('All balances match the ledger.')
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter,
+                               Histogram, generate_latest, multiprocess)
+
+REQUEST_DURATION = Histogram('chiffee_request_duration_seconds',
+                             'Time spent handling a request',
+                             ['view', 'method', 'status'])
+REQUEST_QUERIES = Histogram('chiffee_request_db_queries',
+                            'Number of SQL queries per request',
+                            ['view'],
+                            buckets=[0, 1, 2, 5, 10, 20, 50, 100, 200, 500])
+REQUEST_QUERIES_DURATION = Histogram('chiffee_request_db_duration_seconds',
+                                     'Time spent in SQL queries per request',
+                                     ['view'])
+RESPONSE_SIZE = Histogram('chiffee_response_size_bytes',
+                          'Size of the response body',
+                          ['view'],
+                          buckets=[256, 1024, 4096, 16384, 65536, 262144,
+                                   1048576, 4194304])
+
+PURCHASES = Counter('chiffee_purchases_total', 'Number of settled carts')
+PURCHASED_PRODUCTS = Counter('chiffee_purchased_products_total',
+                             'Number of purchased products')
+DEPOSITS = Counter('chiffee_deposits_total', 'Number of deposits')
+CANCELLATIONS = Counter('chiffee_cancellations_total',
+                        'Number of cancelled carts')
+EMAILS = Counter('chiffee_emails_total',
+                 'Number of delivery attempts of queued emails',
+                 ['status'])
+EMAIL_DURATION = Histogram('chiffee_email_send_duration_seconds',
+                           'Time spent sending a single email')
+
+# Queries of async views run in other threads, which still see the context
+# of the request
+current_timer = ContextVar('current_timer', default=None)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+
+    if timer is None:
+        return execute(sql, params, many, context)
+
+    return timer(execute, sql, params, many, context)
+
+
+def add_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def observe_request(request, response, duration, timer):
+    if request.resolver_match is not None:
+        view = request.resolver_match.view_name
+    else:
+        view = 'unknown'
+
+    REQUEST_DURATION.labels(view,
+                            request.method,
+                            response.status_code).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(timer.count)
+    REQUEST_QUERIES_DURATION.labels(view).observe(timer.time)
+
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        # Lets Django await the middleware instead of running it in a thread
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        start = time.perf_counter()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+
+        observe_request(request, response, time.perf_counter() - start, timer)
+
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        start = time.perf_counter()
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+
+        observe_request(request, response, time.perf_counter() - start, timer)
+
+        return response
+
+
+def generate_metrics():
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,100 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:13
+
+import chiffee.models
+import django.contrib.auth.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django_resized.forms
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('category', models.IntegerField(choices=[(1, 'Trinken'), (2, 'Snacks'), (3, 'Eis')])),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+            ],
+            options={
+                'ordering': ['last_name', 'first_name'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('auth.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Purchase',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('date', models.DateTimeField()),
+                ('key', models.CharField(max_length=64)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='chiffee.product')),
+                ('user', models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-date', 'user', 'product'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('picture', models.ImageField(null=True, upload_to='')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['user'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Employee',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=9)),
+                ('picture', django_resized.forms.ResizedImageField(crop=['middle', 'center'], force_format='JPEG', keep_meta=True, null=True, quality=100, scale=None, size=[300, 300], upload_to=chiffee.models.create_picture_path)),
+                ('picture_placeholder', models.ImageField(default='user-pictures/placeholder.jpg', upload_to='')),
+                ('get_emails_deposits', models.BooleanField(default=True)),
+                ('get_emails_purchases', models.BooleanField(default=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['user'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Deposit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-date', 'user'],
+            },
+        ),
+    ]
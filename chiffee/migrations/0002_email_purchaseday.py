@@ -0,0 +1,63 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def fill_purchase_days(apps, schema_editor):
+    Purchase = apps.get_model('chiffee', 'Purchase')
+    PurchaseDay = apps.get_model('chiffee', 'PurchaseDay')
+    rows = Purchase.objects.annotate(day=TruncDate('date')).values(
+        'user', 'day').annotate(quantity=Sum('quantity'),
+                                total_price=Sum('total_price')).order_by()
+
+    PurchaseDay.objects.bulk_create(
+        [PurchaseDay(user_id=row['user'],
+                     date=row['day'],
+                     quantity=row['quantity'],
+                     total_price=row['total_price']) for row in rows],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Email',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['next_attempt', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PurchaseDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-date', 'user'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_purchase_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0002_email_purchaseday'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', 'date'], name='deposit_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['date'], name='deposit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['next_attempt'], name='email_next_attempt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name'], name='product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['key'], name='purchase_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['user', 'date'], name='purchase_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['product', 'date'], name='purchase_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['date'], name='purchase_date_idx'),
+        ),
+    ]
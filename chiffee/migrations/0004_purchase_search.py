@@ -0,0 +1,104 @@
+from django.db import migrations
+
+INSERT_PURCHASE = '''
+    INSERT INTO chiffee_purchase_search
+        (rowid, username, first_name, last_name, product)
+    SELECT NEW.id, person.username, person.first_name, person.last_name,
+           product.name
+    FROM auth_user AS person, chiffee_product AS product
+    WHERE person.id = NEW.user_id AND product.id = NEW.product_id;
+'''
+
+CREATE_PURCHASE_SEARCH = [
+    '''
+    CREATE VIRTUAL TABLE chiffee_purchase_search USING fts5(
+        username,
+        first_name,
+        last_name,
+        product,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    INSERT INTO chiffee_purchase_search
+        (rowid, username, first_name, last_name, product)
+    SELECT purchase.id, person.username, person.first_name,
+           person.last_name, product.name
+    FROM chiffee_purchase AS purchase
+    JOIN auth_user AS person ON person.id = purchase.user_id
+    JOIN chiffee_product AS product ON product.id = purchase.product_id
+    ''',
+    f'''
+    CREATE TRIGGER chiffee_purchase_search_insert
+    AFTER INSERT ON chiffee_purchase
+    BEGIN
+    {INSERT_PURCHASE}
+    END
+    ''',
+    # Django saves all columns, so the update triggers only rewrite the index
+    # if one of the indexed values really changed
+    f'''
+    CREATE TRIGGER chiffee_purchase_search_update
+    AFTER UPDATE OF id, user_id, product_id ON chiffee_purchase
+    WHEN OLD.id IS NOT NEW.id
+        OR OLD.user_id IS NOT NEW.user_id
+        OR OLD.product_id IS NOT NEW.product_id
+    BEGIN
+        DELETE FROM chiffee_purchase_search WHERE rowid = OLD.id;
+    {INSERT_PURCHASE}
+    END
+    ''',
+    '''
+    CREATE TRIGGER chiffee_purchase_search_delete
+    AFTER DELETE ON chiffee_purchase
+    BEGIN
+        DELETE FROM chiffee_purchase_search WHERE rowid = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER chiffee_purchase_search_user_update
+    AFTER UPDATE OF username, first_name, last_name ON auth_user
+    WHEN OLD.username IS NOT NEW.username
+        OR OLD.first_name IS NOT NEW.first_name
+        OR OLD.last_name IS NOT NEW.last_name
+    BEGIN
+        UPDATE chiffee_purchase_search
+        SET username = NEW.username,
+            first_name = NEW.first_name,
+            last_name = NEW.last_name
+        WHERE rowid IN (SELECT id FROM chiffee_purchase
+                        WHERE user_id = NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER chiffee_purchase_search_product_update
+    AFTER UPDATE OF name ON chiffee_product
+    WHEN OLD.name IS NOT NEW.name
+    BEGIN
+        UPDATE chiffee_purchase_search
+        SET product = NEW.name
+        WHERE rowid IN (SELECT id FROM chiffee_purchase
+                        WHERE product_id = NEW.id);
+    END
+    ''',
+]
+
+DROP_PURCHASE_SEARCH = [
+    'DROP TRIGGER chiffee_purchase_search_product_update',
+    'DROP TRIGGER chiffee_purchase_search_user_update',
+    'DROP TRIGGER chiffee_purchase_search_delete',
+    'DROP TRIGGER chiffee_purchase_search_update',
+    'DROP TRIGGER chiffee_purchase_search_insert',
+    'DROP TABLE chiffee_purchase_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_PURCHASE_SEARCH, DROP_PURCHASE_SEARCH),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0004_purchase_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectorySync',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.CharField(max_length=32)),
+                ('date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+FILL_LEDGER = [
+    '''
+    INSERT INTO chiffee_ledgerentry (user_id, kind, amount, date, "key")
+    SELECT user_id, kind, amount, date, "key" FROM (
+        SELECT user_id, 1 AS kind, -ROUND(SUM(total_price), 2) AS amount,
+               MIN(date) AS date, "key"
+        FROM chiffee_purchase
+        GROUP BY "key", user_id
+        UNION ALL
+        SELECT user_id, 2, ROUND(amount, 2), date, ''
+        FROM chiffee_deposit
+    )
+    ORDER BY date
+    ''',
+    '''
+    INSERT INTO chiffee_ledgerentry (user_id, kind, amount, date, "key")
+    SELECT employee.user_id, 4,
+           ROUND(employee.balance - COALESCE(SUM(entry.amount), 0), 2),
+           STRFTIME('%Y-%m-%d %H:%M:%f', 'now'), ''
+    FROM chiffee_employee AS employee
+    LEFT JOIN chiffee_ledgerentry AS entry
+        ON entry.user_id = employee.user_id
+    GROUP BY employee.user_id, employee.balance
+    HAVING ROUND(employee.balance - COALESCE(SUM(entry.amount), 0), 2) != 0
+    ''',
+    '''
+    CREATE TRIGGER chiffee_ledgerentry_append_only
+    BEFORE UPDATE ON chiffee_ledgerentry
+    BEGIN
+        SELECT RAISE(ABORT, 'ledger entries cannot be changed');
+    END
+    ''',
+]
+
+CLEAR_LEDGER = [
+    'DROP TRIGGER chiffee_ledgerentry_append_only',
+    'DELETE FROM chiffee_ledgerentry',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0006_credential'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.IntegerField(choices=[(1, 'Kauf'), (2, 'Einzahlung'), (3, 'Stornierung'), (4, 'Korrektur')])),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('key', models.CharField(blank=True, max_length=64)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-date', 'user'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_entry', models.BigIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-date', 'user'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['user', 'date'], name='ledger_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balancesnapshot',
+            index=models.Index(fields=['user', 'date'], name='snapshot_user_date_idx'),
+        ),
+        migrations.RunSQL(FILL_LEDGER, CLEAR_LEDGER),
+    ]
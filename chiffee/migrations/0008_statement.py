@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0007_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('name', models.CharField(max_length=200)),
+                ('digest', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chiffee.user')),
+            ],
+            options={
+                'ordering': ['-month', 'user'],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:49
+
+import chiffee.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chiffee', '0008_statement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='picture_processed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='picture',
+            field=models.ImageField(null=True, upload_to=chiffee.models.create_picture_path),
+        ),
+    ]
@@ -1,16 +1,33 @@
+import hashlib
 import os
 
 import django.contrib.auth.models
 from django.db import models
-from django_resized import ResizedImageField
+from django.utils import timezone
 
 CATEGORIES = ((1, 'Trinken'), (2, 'Snacks'), (3, 'Eis'))
+PURCHASE_ENTRY = 1
+DEPOSIT_ENTRY = 2
+CANCELLATION_ENTRY = 3
+CORRECTION_ENTRY = 4
+LEDGER_KINDS = ((PURCHASE_ENTRY, 'Kauf'),
+                (DEPOSIT_ENTRY, 'Einzahlung'),
+                (CANCELLATION_ENTRY, 'Stornierung'),
+                (CORRECTION_ENTRY, 'Korrektur'))
+STATEMENTS_DIR = 'statements'
 USER_PICTURES_DIR = 'user-pictures'
 
 
 def create_picture_path(instance, filename):
+    # The name changes with the content, so pictures can be cached forever
+    digest = hashlib.sha256()
+
+    for chunk in instance.picture.chunks():
+        digest.update(chunk)
+
     return os.path.join(USER_PICTURES_DIR,
-                        f'{instance.user.pk}.{filename.rsplit(".", 1)[1]}')
+                        f'{instance.user.pk}-{digest.hexdigest()[:16]}'
+                        f'{os.path.splitext(filename)[1].lower()}')
 
 
 class User(django.contrib.auth.models.User):
@@ -22,24 +39,73 @@ class User(django.contrib.auth.models.User):
         return f'{self.last_name}, {self.first_name}'
 
 
+class BalanceSnapshot(models.Model):
+    class Meta:
+        ordering = ['-date', 'user']
+        indexes = [models.Index(fields=['user', 'date'],
+                                name='snapshot_user_date_idx')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    balance = models.DecimalField(decimal_places=2, max_digits=9)
+    # Every ledger entry up to this pk is included in the balance. All
+    # snapshots of a run share it, so it is no foreign key that would delete
+    # them together with the user of that entry. The pks of deleted entries
+    # are never reused (AUTOINCREMENT on SQLite).
+    last_entry = models.BigIntegerField()
+    date = models.DateTimeField(default=timezone.now)
+
+
+class Credential(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    password = models.CharField(max_length=128)
+    verified = models.DateTimeField()
+
+
 class Deposit(models.Model):
     class Meta:
         ordering = ['-date', 'user']
+        indexes = [models.Index(fields=['user', 'date'],
+                                name='deposit_user_date_idx'),
+                   models.Index(fields=['date'], name='deposit_date_idx')]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     amount = models.DecimalField(decimal_places=2, max_digits=9)
     date = models.DateTimeField(auto_now_add=True)
 
 
+class DirectorySync(models.Model):
+    # modifyTimestamp of the newest LDAP entry read so far, the next sync only
+    # fetches the entries changed since then
+    timestamp = models.CharField(max_length=32)
+    date = models.DateTimeField(auto_now=True)
+
+
+class Email(models.Model):
+    class Meta:
+        ordering = ['next_attempt', 'pk']
+        indexes = [models.Index(fields=['next_attempt'],
+                                name='email_next_attempt_idx')]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+
 class Employee(models.Model):
     class Meta:
         ordering = ['user']
 
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     balance = models.DecimalField(default=0.0, decimal_places=2, max_digits=9)
-    picture = ResizedImageField(upload_to=create_picture_path,
-                                null=True,
-                                crop=['middle', 'center'])
+    picture = models.ImageField(upload_to=create_picture_path, null=True)
+    picture_processed = models.BooleanField(default=False)
     picture_placeholder = models.ImageField(
         default=os.path.join(USER_PICTURES_DIR, 'placeholder.jpg'))
     get_emails_deposits = models.BooleanField(default=True)
@@ -49,9 +115,26 @@ class Employee(models.Model):
         return f'{self.user.last_name}, {self.user.first_name}'
 
 
+class LedgerEntry(models.Model):
+    class Meta:
+        ordering = ['-date', 'user']
+        indexes = [models.Index(fields=['user', 'date'],
+                                name='ledger_user_date_idx')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.IntegerField(choices=LEDGER_KINDS)
+    amount = models.DecimalField(decimal_places=2, max_digits=9)
+    date = models.DateTimeField(default=timezone.now)
+    key = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return f'{self.user}: {self.get_kind_display()} {self.amount}'
+
+
 class Product(models.Model):
     class Meta:
         ordering = ['name']
+        indexes = [models.Index(fields=['name'], name='product_name_idx')]
 
     name = models.CharField(max_length=200)
     price = models.DecimalField(decimal_places=2, max_digits=9)
@@ -73,6 +156,12 @@ class Profile(models.Model):
 class Purchase(models.Model):
     class Meta:
         ordering = ['-date', 'user', 'product']
+        indexes = [models.Index(fields=['key'], name='purchase_key_idx'),
+                   models.Index(fields=['user', 'date'],
+                                name='purchase_user_date_idx'),
+                   models.Index(fields=['product', 'date'],
+                                name='purchase_product_date_idx'),
+                   models.Index(fields=['date'], name='purchase_date_idx')]
 
     user = models.ForeignKey(User, default=None, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
@@ -80,3 +169,29 @@ class Purchase(models.Model):
     total_price = models.DecimalField(decimal_places=2, max_digits=9)
     date = models.DateTimeField()
     key = models.CharField(max_length=64)
+
+
+class PurchaseDay(models.Model):
+    class Meta:
+        ordering = ['-date', 'user']
+        unique_together = ['user', 'date']
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    total_price = models.DecimalField(default=0,
+                                      decimal_places=2,
+                                      max_digits=9)
+
+
+class Statement(models.Model):
+    class Meta:
+        ordering = ['-month', 'user']
+        unique_together = ['user', 'month']
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    # Path of the statement files in MEDIA_ROOT, without extension
+    name = models.CharField(max_length=200)
+    digest = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now=True)
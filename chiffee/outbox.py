@@ -0,0 +1,100 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .metrics import EMAIL_DURATION, EMAILS
+from .models import Email
+
+EMAIL_ADDRESS = 'kaffeekasse@chi.uni-hannover.de'
+EMAIL_SUBJECT = 'Kauf Kaffeekasse'
+
+MAX_ATTEMPTS = 10
+MAX_BACKOFF = timedelta(hours=6)
+
+logger = logging.getLogger('outbox')
+
+
+def queue_email(recipient, message, subject=EMAIL_SUBJECT):
+    return Email.objects.create(recipient=recipient,
+                                subject=subject,
+                                message=message)
+
+
+def queue_emails(messages, subject=EMAIL_SUBJECT):
+    return Email.objects.bulk_create([Email(recipient=recipient,
+                                            subject=subject,
+                                            message=message)
+                                      for recipient, message in messages])
+
+
+def get_backoff(attempts):
+    return min(timedelta(minutes=2 ** attempts), MAX_BACKOFF)
+
+
+def get_pending_emails(limit=None):
+    emails = Email.objects.filter(attempts__lt=MAX_ATTEMPTS,
+                                  next_attempt__lte=timezone.now())
+
+    if limit is not None:
+        emails = emails[:limit]
+
+    return list(emails)
+
+
+def _defer(email, error):
+    email.attempts += 1
+    email.next_attempt = timezone.now() + get_backoff(email.attempts)
+    email.error = str(error)
+    email.save(update_fields=['attempts', 'next_attempt', 'error'])
+
+    if email.attempts >= MAX_ATTEMPTS:
+        logger.error(f'Giving up on email {email.pk} to {email.recipient}.')
+
+
+def deliver_emails(emails, connection=None):
+    if len(emails) == 0:
+        return 0
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = 0
+
+    try:
+        connection.open()
+    except Exception as error:
+        EMAILS.labels('failed').inc(len(emails))
+        logger.warning(f'Could not connect to the mail server: {error}')
+
+        for email in emails:
+            _defer(email, error)
+
+        return sent
+
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject,
+                                   email.message,
+                                   EMAIL_ADDRESS,
+                                   [email.recipient],
+                                   connection=connection)
+
+            start = time.perf_counter()
+
+            try:
+                message.send()
+            except Exception as error:
+                EMAILS.labels('failed').inc()
+                logger.warning(f'Could not send email {email.pk}: {error}')
+                _defer(email, error)
+            else:
+                EMAILS.labels('sent').inc()
+                email.delete()
+                sent += 1
+            finally:
+                EMAIL_DURATION.observe(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+    return sent
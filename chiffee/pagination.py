@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S%f'
+PAGE_SIZE = 10
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+        if len(object_list) > 0:
+            self.next_cursor = encode_cursor(object_list[-1])
+            self.previous_cursor = encode_cursor(object_list[0])
+        else:
+            self.next_cursor = None
+            self.previous_cursor = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def decode_cursor(cursor):
+    try:
+        date, pk = cursor.split('-')
+        date = datetime.strptime(date, CURSOR_DATE_FORMAT)
+        pk = int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+    return date.replace(tzinfo=timezone.utc), pk
+
+
+def encode_cursor(instance):
+    date = instance.date.astimezone(timezone.utc)
+
+    return f'{date.strftime(CURSOR_DATE_FORMAT)}-{instance.pk}'
+
+
+def get_keyset_page(queryset, after=None, before=None, page_size=PAGE_SIZE):
+    before = decode_cursor(before)
+    after = decode_cursor(after)
+
+    if before is not None:
+        date, pk = before
+        object_list = list(queryset.filter(
+            Q(date__gt=date) | Q(date=date, pk__gt=pk)).order_by(
+            'date', 'pk')[:page_size + 1])
+        has_previous = len(object_list) > page_size
+        object_list = object_list[:page_size][::-1]
+
+        return KeysetPage(object_list, True, has_previous)
+
+    queryset = queryset.order_by('-date', '-pk')
+
+    if after is not None:
+        date, pk = after
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+
+    object_list = list(queryset[:page_size + 1])
+
+    return KeysetPage(object_list[:page_size],
+                      len(object_list) > page_size,
+                      after is not None)
+
+
+def get_query_params(query_dict, exclude=('after', 'before', 'page')):
+    return [(name, value)
+            for name, values in query_dict.lists() if name not in exclude
+            for value in values]
@@ -0,0 +1,102 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Employee
+
+PICTURE_SIZES = (48, 100, 300)
+# Uploads are served as they are until they are processed
+PICTURE_MAX_BYTES = 5 * 1024 * 1024
+PICTURE_MAX_PIXELS = 4096 * 4096
+PICTURE_FORMATS = (('jpg', 'JPEG', {'quality': 85,
+                                    'optimize': True,
+                                    'progressive': True}),
+                   ('webp', 'WEBP', {'quality': 80, 'method': 4}))
+
+logger = logging.getLogger('pictures')
+
+
+def get_variant_name(name, size, extension):
+    return f'{os.path.splitext(name)[0]}-{size}.{extension}'
+
+
+def get_picture_url(picture, processed, size, extension='jpg'):
+    if not picture:
+        return None
+
+    # Pictures waiting to be processed are shown as uploaded
+    if not processed:
+        return default_storage.url(str(picture))
+
+    fitting = [variant for variant in PICTURE_SIZES if variant >= size]
+    size = fitting[0] if len(fitting) > 0 else PICTURE_SIZES[-1]
+
+    return default_storage.url(get_variant_name(str(picture), size, extension))
+
+
+def delete_picture(employee):
+    if not employee.picture:
+        return
+
+    for size in PICTURE_SIZES:
+        for extension, _, _ in PICTURE_FORMATS:
+            default_storage.delete(get_variant_name(employee.picture.name,
+                                                    size,
+                                                    extension))
+
+    employee.picture.delete(save=False)
+    employee.picture_processed = False
+
+
+def get_pending_pictures(limit=None):
+    employees = Employee.objects.filter(picture_processed=False,
+                                        picture__gt='').order_by('pk')
+
+    if limit is not None:
+        employees = employees[:limit]
+
+    return list(employees)
+
+
+def process_picture(employee):
+    name = employee.picture.name
+
+    try:
+        if employee.picture.size > PICTURE_MAX_BYTES:
+            raise ValueError(f'{employee.picture.size} bytes')
+
+        with employee.picture.open('rb') as file:
+            image = Image.open(file)
+
+            if image.width * image.height > PICTURE_MAX_PIXELS:
+                raise ValueError(f'{image.width}x{image.height} pixels')
+
+            image = ImageOps.exif_transpose(image).convert('RGB')
+
+        for size in PICTURE_SIZES:
+            variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+
+            for extension, image_format, options in PICTURE_FORMATS:
+                output = io.BytesIO()
+                variant.save(output, image_format, **options)
+                variant_name = get_variant_name(name, size, extension)
+                default_storage.delete(variant_name)
+                default_storage.save(variant_name,
+                                     ContentFile(output.getvalue()))
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning(f'Could not process picture {name}: {error}')
+        delete_picture(employee)
+        Employee.objects.filter(pk=employee.pk, picture=name).update(
+            picture=None)
+
+        return False
+
+    # The user may have uploaded another picture in the meantime
+    Employee.objects.filter(pk=employee.pk, picture=name).update(
+        picture_processed=True)
+
+    return True
@@ -0,0 +1,184 @@
+import secrets
+from decimal import Decimal
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from .cart import price_cart
+from .metrics import CANCELLATIONS, DEPOSITS, PURCHASED_PRODUCTS, PURCHASES
+from .models import (CANCELLATION_ENTRY, DEPOSIT_ENTRY, PURCHASE_ENTRY,
+                     Deposit, Employee, LedgerEntry, Product, Purchase,
+                     PurchaseDay)
+
+
+BALANCE_BATCH_SIZE = 400
+
+
+class Settlement:
+    def __init__(self, user, employee, key=None, lines=None, total=0,
+                 balance=None):
+        self.user = user
+        self.employee = employee
+        self.key = key
+        self.lines = lines if lines is not None else []
+        self.total = total
+        self.balance = balance if balance is not None else employee.balance
+
+
+def generate_key():
+    while True:
+        key = secrets.token_hex(32)
+
+        try:
+            if not Purchase.objects.filter(key=key).exists():
+                break
+        except OperationalError:
+            break
+
+    return key
+
+
+def _change_purchase_day(user, date, quantity, total_price):
+    date = timezone.localdate(date)
+    purchase_days = PurchaseDay.objects.filter(user=user, date=date)
+    changes = {'quantity': F('quantity') + quantity,
+               'total_price': F('total_price') + total_price}
+
+    if purchase_days.update(**changes) == 0:
+        try:
+            with transaction.atomic():
+                PurchaseDay.objects.create(user=user,
+                                           date=date,
+                                           quantity=quantity,
+                                           total_price=total_price)
+        except IntegrityError:
+            purchase_days.update(**changes)
+
+
+def _change_balance(user, amount, kind, key='', date=None):
+    LedgerEntry.objects.create(user=user,
+                               kind=kind,
+                               amount=amount,
+                               key=key,
+                               date=date or timezone.now())
+    employee, _ = Employee.objects.get_or_create(user=user)
+    Employee.objects.filter(pk=employee.pk).update(
+        balance=F('balance') + amount)
+    employee.refresh_from_db(fields=['balance'])
+
+    return employee
+
+
+def charge_cart(shopping_cart, user):
+    now = timezone.now()
+    key = generate_key()
+
+    with transaction.atomic():
+        cart = price_cart(shopping_cart)
+
+        if len(cart.stale) > 0:
+            raise Product.DoesNotExist(
+                f'Products {", ".join(cart.stale)} do not exist.')
+
+        purchases = [Purchase(user=user,
+                              product=line.product,
+                              quantity=line.quantity,
+                              total_price=line.total_price,
+                              date=now,
+                              key=key) for line in cart.lines]
+        lines = [(line.quantity, line.product, line.total_price)
+                 for line in cart.lines]
+        total = cart.total
+
+        quantity = sum(purchase.quantity for purchase in purchases)
+        Purchase.objects.bulk_create(purchases)
+        _change_purchase_day(user, now, quantity, total)
+        employee = _change_balance(user, -total, PURCHASE_ENTRY, key, now)
+        transaction.on_commit(PURCHASES.inc)
+        transaction.on_commit(lambda: PURCHASED_PRODUCTS.inc(quantity))
+
+    return Settlement(user, employee, key, lines, total)
+
+
+def deposit_money(user, amount):
+    amount = Decimal(amount)
+
+    with transaction.atomic():
+        Deposit.objects.create(user=user, amount=amount)
+        employee = _change_balance(user, amount, DEPOSIT_ENTRY)
+        transaction.on_commit(DEPOSITS.inc)
+
+    return Settlement(user, employee, total=amount)
+
+
+def deposit_many(deposits):
+    deposits = [(user, Decimal(amount)) for user, amount in deposits]
+    amounts = {}
+
+    for user, amount in deposits:
+        amounts[user.pk] = amounts.get(user.pk, 0) + amount
+
+    with transaction.atomic():
+        existing = set(Employee.objects.filter(
+            user__in=list(amounts)).values_list('user', flat=True))
+        Employee.objects.bulk_create([Employee(user_id=pk)
+                                      for pk in amounts if pk not in existing])
+        Deposit.objects.bulk_create([Deposit(user=user, amount=amount)
+                                     for user, amount in deposits])
+        LedgerEntry.objects.bulk_create([LedgerEntry(user=user,
+                                                     kind=DEPOSIT_ENTRY,
+                                                     amount=amount)
+                                         for user, amount in deposits])
+        pks = list(amounts)
+
+        for i in range(0, len(pks), BALANCE_BATCH_SIZE):
+            batch = pks[i:i + BALANCE_BATCH_SIZE]
+            increments = [When(user=pk, then=Value(amounts[pk]))
+                          for pk in batch]
+            Employee.objects.filter(user__in=batch).update(
+                balance=F('balance') + Case(
+                    *increments,
+                    output_field=DecimalField(decimal_places=2,
+                                              max_digits=9)))
+
+        employees = {employee.user_id: employee
+                     for employee in Employee.objects.filter(user__in=pks)}
+        transaction.on_commit(lambda: DEPOSITS.inc(len(deposits)))
+
+    settlements = []
+    balances = {pk: employees[pk].balance - amount
+                for pk, amount in amounts.items()}
+
+    for user, amount in deposits:
+        balances[user.pk] += amount
+        settlements.append(Settlement(user,
+                                      employees[user.pk],
+                                      total=amount,
+                                      balance=balances[user.pk]))
+
+    return settlements
+
+
+def cancel_purchase(key):
+    with transaction.atomic():
+        purchases = list(Purchase.objects.select_related(
+            'product', 'user').filter(key=key))
+
+        if len(purchases) == 0:
+            return None
+
+        user = purchases[0].user
+        lines = [(purchase.quantity, purchase.product, purchase.total_price)
+                 for purchase in purchases]
+        total = sum(purchase.total_price for purchase in purchases)
+
+        Purchase.objects.filter(key=key).delete()
+        _change_purchase_day(user,
+                             purchases[0].date,
+                             -sum(purchase.quantity for purchase in purchases),
+                             -total)
+        employee = _change_balance(user, total, CANCELLATION_ENTRY, key)
+        transaction.on_commit(CANCELLATIONS.inc)
+
+    return Settlement(user, employee, key, lines, total)
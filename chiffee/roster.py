@@ -0,0 +1,69 @@
+from .caching import bump_version, get_versioned
+from .models import User
+from .pictures import get_picture_url
+
+ROLES = ('prof', 'wimi', 'stud')
+ROSTER_CACHE = 'roster'
+# Saving other fields of users and employees, e.g. balances, keeps the roster
+ROSTER_FIELDS = frozenset(['username', 'first_name', 'last_name', 'is_active',
+                           'picture', 'picture_processed'])
+ROSTER_TIMEOUT = 24 * 60 * 60
+ROSTER_PICTURE_SIZE = 100
+ROSTER_THUMBNAIL_SIZE = 48
+
+
+class RosterUser:
+    def __init__(self, pk, username, first_name, last_name, role, picture,
+                 picture_processed):
+        self.pk = pk
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.picture_url = get_picture_url(picture,
+                                           picture_processed,
+                                           ROSTER_PICTURE_SIZE)
+        self.thumbnail_url = get_picture_url(picture,
+                                             picture_processed,
+                                             ROSTER_THUMBNAIL_SIZE)
+
+    def __str__(self):
+        return f'{self.last_name}, {self.first_name}'
+
+
+def build_roster():
+    rows = User.objects.filter(
+        groups__name__in=ROLES,
+        is_active=True).order_by('last_name', 'first_name', 'pk').values_list(
+        'pk',
+        'username',
+        'first_name',
+        'last_name',
+        'groups__name',
+        'employee__picture',
+        'employee__picture_processed')
+    roster = {}
+
+    for (pk, username, first_name, last_name, role, picture,
+         picture_processed) in rows:
+        if pk in roster:
+            if ROLES.index(role) < ROLES.index(roster[pk].role):
+                roster[pk].role = role
+        else:
+            roster[pk] = RosterUser(pk,
+                                    username,
+                                    first_name,
+                                    last_name,
+                                    role,
+                                    picture,
+                                    picture_processed)
+
+    return list(roster.values())
+
+
+def get_roster():
+    return get_versioned(ROSTER_CACHE, build_roster, ROSTER_TIMEOUT)
+
+
+def invalidate_roster():
+    bump_version(ROSTER_CACHE)
@@ -0,0 +1,42 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+PURCHASE_SEARCH_TABLE = 'chiffee_purchase_search'
+TOKEN = re.compile(r'\w+')
+
+
+def get_match_query(text):
+    return ' '.join(f'"{token}"*' for token in TOKEN.findall(text))
+
+
+def rebuild_purchase_search():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {PURCHASE_SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {PURCHASE_SEARCH_TABLE} '
+            f'(rowid, username, first_name, last_name, product) '
+            f'SELECT purchase.id, person.username, person.first_name, '
+            f'person.last_name, product.name '
+            f'FROM chiffee_purchase AS purchase '
+            f'JOIN auth_user AS person ON person.id = purchase.user_id '
+            f'JOIN chiffee_product AS product '
+            f'ON product.id = purchase.product_id')
+        count = cursor.rowcount
+        cursor.execute(f"INSERT INTO {PURCHASE_SEARCH_TABLE} "
+                       f"({PURCHASE_SEARCH_TABLE}) VALUES ('optimize')")
+
+    return count
+
+
+def search_purchases(purchases, text):
+    match = get_match_query(text)
+
+    if match == '':
+        return purchases
+
+    return purchases.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {PURCHASE_SEARCH_TABLE} '
+        f'WHERE {PURCHASE_SEARCH_TABLE} MATCH %s',
+        (match,)))
@@ -0,0 +1,55 @@
+import django.contrib.auth.models
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django_auth_ldap.backend import ldap_error
+
+from .catalog import invalidate_catalog
+from .ldapauth import CachedLDAPBackend, raise_directory_unavailable
+from .metrics import add_query_timer
+from .models import Employee, Product, User
+from .roster import ROSTER_FIELDS, invalidate_roster
+from .usersearch import invalidate_user_search
+
+
+def invalidate_catalog_on_change(sender, instance, **kwargs):
+    invalidate_catalog()
+
+
+def invalidate_roster_on_change(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+
+    if update_fields is not None and not update_fields & ROSTER_FIELDS:
+        return
+
+    invalidate_roster()
+
+
+def invalidate_roster_on_groups_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_roster()
+
+
+def invalidate_user_search_on_change(sender, instance, **kwargs):
+    if kwargs.get('update_fields') == frozenset(['last_login']):
+        return
+
+    invalidate_user_search()
+
+
+post_save.connect(invalidate_catalog_on_change, sender=Product)
+post_delete.connect(invalidate_catalog_on_change, sender=Product)
+
+for model in (django.contrib.auth.models.User, User, Employee):
+    post_save.connect(invalidate_roster_on_change, sender=model)
+    post_delete.connect(invalidate_roster_on_change, sender=model)
+
+for model in (django.contrib.auth.models.User, User):
+    post_save.connect(invalidate_user_search_on_change, sender=model)
+    post_delete.connect(invalidate_user_search_on_change, sender=model)
+
+m2m_changed.connect(invalidate_roster_on_groups_change,
+                    sender=django.contrib.auth.models.User.groups.through)
+
+ldap_error.connect(raise_directory_unavailable, sender=CachedLDAPBackend)
+
+connection_created.connect(add_query_timer)
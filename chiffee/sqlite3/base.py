@@ -0,0 +1,56 @@
+import logging
+import random
+import time
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+logger = logging.getLogger('sqlite3')
+
+PRAGMAS = {'journal_mode': 'wal',
+           'synchronous': 'normal',
+           'mmap_size': 256 * 1024 * 1024,
+           # Negative sizes are in KiB instead of pages
+           'cache_size': -64 * 1024,
+           'busy_timeout': 5000,
+           'temp_store': 'memory'}
+TRANSACTION_RETRIES = 3
+RETRY_DELAY = 0.05
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_retries = params.pop('transaction_retries',
+                                              TRANSACTION_RETRIES)
+        # Python's own busy handler would otherwise wait 5 seconds
+        params['timeout'] = self.pragmas['busy_timeout'] / 1000
+
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads first and writes later fails
+        # immediately with "database is locked" if another connection wrote
+        # in the meantime, so the write lock is taken right away
+        for attempt in range(self.transaction_retries + 1):
+            try:
+                self.cursor().execute('BEGIN IMMEDIATE')
+
+                return
+            except OperationalError as error:
+                if ('locked' not in str(error)
+                        or attempt == self.transaction_retries):
+                    raise
+
+                logger.warning(f'Database is locked, retrying transaction '
+                               f'({attempt + 1}/{self.transaction_retries}).')
+                time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(1, 2))
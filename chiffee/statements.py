@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .ledger import get_balances_before
+from .models import (LEDGER_KINDS, PURCHASE_ENTRY, STATEMENTS_DIR, LedgerEntry,
+                     Purchase, Statement, User)
+from .outbox import queue_emails
+
+STATEMENT_FORMATS = ('txt', 'html')
+STATEMENT_SUBJECT = 'Kontoauszug Kaffeekasse'
+
+
+def get_month_range(month):
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    return (timezone.make_aware(datetime.combine(month, time())),
+            timezone.make_aware(datetime.combine(next_month, time())))
+
+
+def get_digest(statement):
+    data = json.dumps(statement, default=str, sort_keys=True)
+
+    return hashlib.sha256(data.encode('UTF-8')).hexdigest()
+
+
+def get_statements(month):
+    start, end = get_month_range(month)
+    openings = get_balances_before(start)
+    kinds = dict(LEDGER_KINDS)
+    items = {}
+    lines = {}
+
+    for key, quantity, name in Purchase.objects.filter(
+            date__gte=start, date__lt=end).order_by('pk').values_list(
+            'key', 'quantity', 'product__name'):
+        items.setdefault(key, []).append(f'{quantity} {name}')
+
+    for user, kind, amount, date, key in LedgerEntry.objects.filter(
+            date__gte=start, date__lt=end).order_by(
+            'user', 'date', 'pk').values_list('user', 'kind', 'amount',
+                                              'date', 'key'):
+        description = kinds[kind]
+
+        if kind == PURCHASE_ENTRY and key in items:
+            description = ', '.join(items[key])
+
+        lines.setdefault(user, []).append((date, description, amount))
+
+    statements = []
+
+    for user, username, first_name, last_name, email, is_active in (
+            User.objects.order_by('pk').values_list('pk',
+                                                    'username',
+                                                    'first_name',
+                                                    'last_name',
+                                                    'email',
+                                                    'is_active')):
+        opening = openings.get(user, 0)
+
+        if user not in lines and opening == 0:
+            continue
+
+        statement = {'user': user,
+                     'username': username,
+                     'first_name': first_name,
+                     'last_name': last_name,
+                     'month': month,
+                     'last_day': (end - timedelta(days=1)).date(),
+                     'opening': opening,
+                     'closing': opening + sum(amount for _, _, amount
+                                              in lines.get(user, [])),
+                     'lines': lines.get(user, [])}
+        statements.append((statement,
+                           get_digest(statement),
+                           email if is_active else ''))
+
+    return statements
+
+
+def render_statements(statements):
+    rendered = []
+
+    for statement, name in statements:
+        for extension in STATEMENT_FORMATS:
+            content = render_to_string(f'chiffee/statement.{extension}',
+                                       statement)
+            path = f'{name}.{extension}'
+            default_storage.delete(path)
+            default_storage.save(path, ContentFile(content.encode('UTF-8')))
+
+            if extension == 'txt':
+                rendered.append((statement['user'], content))
+
+    return rendered
+
+
+def generate_statements(month, workers=None, force=False, email=False):
+    workers = workers or os.cpu_count()
+    existing = {statement.user_id: statement
+                for statement in Statement.objects.filter(month=month)}
+    changed = []
+    recipients = {}
+
+    for statement, digest, recipient in get_statements(month):
+        previous = existing.get(statement['user'])
+
+        if not force and previous is not None and previous.digest == digest:
+            continue
+
+        if previous is None:
+            previous = Statement(user_id=statement['user'],
+                                 month=month,
+                                 name=os.path.join(
+                                     STATEMENTS_DIR,
+                                     f'{month:%Y-%m}',
+                                     f'{statement["username"]}-'
+                                     f'{secrets.token_hex(8)}'))
+
+        previous.digest = digest
+        previous.created = timezone.now()
+        changed.append((statement, previous))
+        recipients[statement['user']] = recipient
+
+    workers = min(workers, max(len(changed), 1))
+    shards = [[(statement, previous.name)
+               for statement, previous in changed[i::workers]]
+              for i in range(workers)]
+
+    if workers == 1:
+        rendered = render_statements(shards[0])
+    else:
+        # The workers only render and write files, so they never use the
+        # database connections inherited from this process
+        connections.close_all()
+
+        with ProcessPoolExecutor(workers,
+                                 initializer=django.setup) as executor:
+            rendered = [result
+                        for results in executor.map(render_statements, shards)
+                        for result in results]
+
+    with transaction.atomic():
+        Statement.objects.bulk_create([previous for _, previous in changed
+                                       if previous.pk is None])
+        Statement.objects.bulk_update([previous for _, previous in changed
+                                       if previous.pk is not None],
+                                      ['digest', 'created'])
+
+        if email:
+            queue_emails([(recipients[user], content)
+                          for user, content in rendered
+                          if recipients[user] != ''],
+                         f'{STATEMENT_SUBJECT} {month:%m/%Y}')
+
+    return len(changed)
@@ -0,0 +1,43 @@
+document.addEventListener('DOMContentLoaded', function () {
+    let inputs = document.getElementsByClassName('user-search');
+
+    for (let i = 0; i < inputs.length; i++) {
+        inputs[i].addEventListener('input', searchUsers);
+        inputs[i].addEventListener('change', selectUser);
+    }
+});
+
+function searchUsers(event) {
+    const input = event.target;
+    const url = new URL(input.dataset.url, window.location.href);
+    url.searchParams.set('q', input.value);
+
+    fetch(url, {credentials: 'same-origin'}).then(function (response) {
+        return response.json();
+    }).then(function (data) {
+        const list = document.getElementById(input.getAttribute('list'));
+        list.innerHTML = '';
+
+        for (let i = 0; i < data['results'].length; i++) {
+            let option = document.createElement('option');
+            option.value = data['results'][i]['text'];
+            option.dataset.id = data['results'][i]['id'];
+            list.appendChild(option);
+        }
+
+        selectUser(event);
+    });
+}
+
+function selectUser(event) {
+    const input = event.target;
+    const hidden = input.previousElementSibling;
+    const options = document.getElementById(input.getAttribute('list')).options;
+    hidden.value = '';
+
+    for (let i = 0; i < options.length; i++) {
+        if (options[i].value === input.value) {
+            hidden.value = options[i].dataset.id;
+        }
+    }
+}
@@ -0,0 +1,148 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                staticfiles_storage)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+
+from .catalog import invalidate_catalog
+from .models import USER_PICTURES_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.ttf', '.txt')
+# Pictures named after their content, see create_picture_path
+HASHED_PICTURE = re.compile(
+    rf'^{USER_PICTURES_DIR}/\d+-[0-9a-f]{{16}}(-\d+)?\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+PRIVATE = 'private, no-cache'
+REVALIDATE = 'no-cache'
+
+
+def compress(data):
+    variants = [('gz', gzip.compress(data, 9, mtime=0))]
+
+    if brotli is not None:
+        variants.append(('br', brotli.compress(data)))
+
+    return [(encoding, content) for encoding, content in variants
+            if len(content) < len(data)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    @cached_property
+    def hashed_names(self):
+        return set(self.hashed_files.values())
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+
+        if kwargs.get('dry_run'):
+            return
+
+        self.__dict__.pop('hashed_names', None)
+
+        for name in set(self.hashed_files.values()):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+
+            with self.open(name) as file:
+                data = file.read()
+
+            for extension, content in compress(data):
+                self.delete(f'{name}.{extension}')
+                self.save(f'{name}.{extension}', ContentFile(content))
+
+        # The cached catalog contains URLs of the previous static files
+        invalidate_catalog()
+
+
+def get_file_path(root, path):
+    try:
+        full_path = safe_join(root, posixpath.normpath(path).lstrip('/'))
+    except SuspiciousFileOperation:
+        raise Http404()
+
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    return full_path
+
+
+def get_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+    return {part.split(';')[0].strip() for part in header.split(',')}
+
+
+def serve_file(request, full_path, cache_control, encodings=None):
+    content_type, _ = mimetypes.guess_type(full_path)
+    encoding = None
+
+    for name, extension in (('br', 'br'), ('gzip', 'gz')):
+        if (encodings is not None and name in encodings
+                and os.path.isfile(f'{full_path}.{extension}')):
+            encoding = name
+            full_path = f'{full_path}.{extension}'
+            break
+
+    stat = os.stat(full_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    response = get_conditional_response(request,
+                                        etag=etag,
+                                        last_modified=int(stat.st_mtime))
+
+    if response is None:
+        response = FileResponse(
+            open(full_path, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+
+    response['Cache-Control'] = cache_control
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+
+    if encoding is not None and response.status_code == 200:
+        response['Content-Encoding'] = encoding
+
+    if encodings is not None:
+        response['Vary'] = 'Accept-Encoding'
+
+    return response
+
+
+def serve_media(request, path):
+    # Everything else in MEDIA_ROOT, e.g. the statements, is not public
+    if not posixpath.normpath(path).startswith(f'{USER_PICTURES_DIR}/'):
+        raise Http404()
+
+    full_path = get_file_path(settings.MEDIA_ROOT, path)
+    cache_control = IMMUTABLE if HASHED_PICTURE.match(path) else REVALIDATE
+
+    return serve_file(request, full_path, cache_control)
+
+
+def serve_private_media(request, name):
+    full_path = get_file_path(settings.MEDIA_ROOT, name)
+
+    return serve_file(request, full_path, PRIVATE)
+
+
+def serve_static(request, path):
+    full_path = get_file_path(settings.STATIC_ROOT, path)
+    hashed_names = getattr(staticfiles_storage, 'hashed_names', set())
+    cache_control = IMMUTABLE if path in hashed_names else REVALIDATE
+
+    return serve_file(request, full_path, cache_control, get_encodings(request))
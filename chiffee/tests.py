@@ -0,0 +1,437 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
+from multiprocessing.connection import Listener
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .ldapsync import get_sync_timestamp
+from .ledger import get_mismatches
+from .management.commands.benchmark import (get_missing_pages,
+                                            get_percentile, get_scenarios)
+from .management.commands.checkqueryplans import find_problems
+from .models import (CANCELLATION_ENTRY, DEPOSIT_ENTRY, PURCHASE_ENTRY,
+                     Deposit, Email, Employee, LedgerEntry, Product,
+                     Purchase, PurchaseDay, Statement, User)
+from .purchases import (cancel_purchase, charge_cart, deposit_many,
+                        deposit_money)
+from .writer import Writer, WriterError, execute, get_authkey
+
+LDAP_SETTINGS = {
+    'AUTH_LDAP_BASE_DN': 'dc=example,dc=org',
+    'AUTH_LDAP_CN_ADMINS': 'cn=admins',
+    'AUTH_LDAP_MIRROR_GROUPS': ['prof', 'stud'],
+    'AUTH_LDAP_OU_GROUPS': 'ou=groups',
+    'AUTH_LDAP_USER_ATTR_MAP': {'username': 'uid',
+                                'first_name': 'givenName',
+                                'last_name': 'sn',
+                                'email': 'mail'}}
+
+
+def get_user_entry(username, last_name, timestamp):
+    return (f'dn: uid={username},ou=people,dc=example,dc=org\n'
+            f'objectClass: posixAccount\n'
+            f'uid: {username}\n'
+            f'givenName: {username.capitalize()}\n'
+            f'sn: {last_name}\n'
+            f'mail: {username}@example.org\n'
+            f'modifyTimestamp: {timestamp}\n')
+
+
+def get_group_entry(name, usernames):
+    return (f'dn: cn={name},ou=groups,dc=example,dc=org\n'
+            f'objectClass: posixGroup\n'
+            f'cn: {name}\n' +
+            ''.join(f'memberUid: {username}\n' for username in usernames))
+
+
+class BenchmarkTest(TestCase):
+    def test_every_page_has_a_scenario(self):
+        scenarios = get_scenarios(Product(pk=1, name='Kaffee'),
+                                  User(pk=1, username='anna', last_name='A'),
+                                  '0' * 64,
+                                  Statement(pk=1))
+
+        self.assertEqual(get_missing_pages(scenarios), set())
+
+    def test_percentile(self):
+        latencies = [5, 1, 4, 2, 3]
+
+        self.assertEqual(get_percentile(latencies, 50), 3)
+        self.assertEqual(get_percentile(latencies, 95), 5)
+
+
+class CheckQueryPlansTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        output = io.StringIO()
+        call_command('checkqueryplans', stdout=output)
+
+        self.assertIn('All hot queries use indexes.', output.getvalue())
+
+    def test_find_problems(self):
+        self.assertEqual(find_problems(['SCAN chiffee_purchase'], False),
+                         ['full scan of chiffee_purchase'])
+        self.assertEqual(
+            find_problems(['SCAN chiffee_purchase USING INDEX '
+                           'purchase_date_idx',
+                           'USE TEMP B-TREE FOR ORDER BY'], True),
+            ['sort without index'])
+        self.assertEqual(find_problems(['USE TEMP B-TREE FOR ORDER BY'],
+                                       False),
+                         [])
+
+
+class DepositsImportTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create(username='admin',
+                                    is_staff=True,
+                                    is_superuser=True)
+        self.anna = User.objects.create(username='anna',
+                                        email='anna@example.org')
+        self.ben = User.objects.create(username='ben', email='ben@example.org')
+        Employee.objects.create(user=self.anna, balance=Decimal('1.50'))
+        Employee.objects.create(user=self.ben, get_emails_deposits=False)
+        self.client.force_login(admin)
+
+    def get_balances(self):
+        return list(Employee.objects.order_by('user__username').values_list(
+            'balance', flat=True))
+
+    def preview(self):
+        file = SimpleUploadedFile('deposits.csv',
+                                  b'username,amount\nanna,10\nben,"2,50"\n'
+                                  b'anna,5\n')
+
+        return self.client.post('/admin/deposits/import/', {'file': file})
+
+    def test_preview_and_confirm(self):
+        response = self.preview()
+
+        self.assertTrue(response.context['valid'])
+        self.assertEqual(response.context['total'], Decimal('17.50'))
+        self.assertEqual(Deposit.objects.count(), 0)
+
+        response = self.client.post('/admin/deposits/import/',
+                                    {'confirm': ''})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Deposit.objects.count(), 3)
+        self.assertEqual(LedgerEntry.objects.count(), 3)
+        self.assertEqual(self.get_balances(),
+                         [Decimal('16.50'), Decimal('2.50')])
+        self.assertEqual(list(Email.objects.values_list('recipient',
+                                                        flat=True)),
+                         ['anna@example.org', 'anna@example.org'])
+
+        # The import is gone from the session, so it cannot be booked twice
+        self.client.post('/admin/deposits/import/', {'confirm': ''})
+
+        self.assertEqual(Deposit.objects.count(), 3)
+
+    def test_cancel(self):
+        self.preview()
+        response = self.client.post('/admin/deposits/import/',
+                                    {'cancel': ''})
+
+        self.assertRedirects(response, '/admin/deposits/')
+        self.assertNotIn('deposit_import', self.client.session)
+        self.assertEqual(Deposit.objects.count(), 0)
+
+    def test_failed_notifications_roll_back_deposits(self):
+        self.preview()
+
+        with mock.patch('chiffee.views.queue_emails',
+                        side_effect=DatabaseError('outbox is full')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/admin/deposits/import/', {'confirm': ''})
+
+        self.assertEqual(Deposit.objects.count(), 0)
+        self.assertEqual(LedgerEntry.objects.count(), 0)
+        self.assertEqual(self.get_balances(), [Decimal('1.50'), 0])
+
+    def test_lost_writer_result(self):
+        self.preview()
+
+        with mock.patch('chiffee.views.execute', side_effect=WriterError):
+            response = self.client.post('/admin/deposits/import/',
+                                        {'confirm': ''})
+
+        self.assertTrue(response.context['pending'])
+        self.assertNotIn('deposit_import', self.client.session)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/',
+                                         HTTP_AUTHORIZATION='Bearer wrong'
+                                         ).status_code,
+                         403)
+
+        # Scrapes must not take the write lock of the production database
+        with self.assertNumQueries(0):
+            response = self.client.get('/metrics/',
+                                       HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+
+
+class PurchasesTest(TestCase):
+    def setUp(self):
+        self.anna = User.objects.create(username='anna')
+        self.ben = User.objects.create(username='ben')
+        self.coffee = Product.objects.create(name='Kaffee',
+                                             price=Decimal('0.50'),
+                                             category=1)
+        self.mate = Product.objects.create(name='Mate',
+                                           price=Decimal('1.20'),
+                                           category=1)
+
+    def get_balance(self, user):
+        return Employee.objects.get(user=user).balance
+
+    def get_ledger(self):
+        return list(LedgerEntry.objects.order_by('pk').values_list(
+            'user__username', 'kind', 'amount', 'key'))
+
+    def get_purchase_days(self):
+        return list(PurchaseDay.objects.values_list('user__username',
+                                                    'date',
+                                                    'quantity',
+                                                    'total_price'))
+
+    def test_purchase(self):
+        settlement = charge_cart({str(self.coffee.pk): 2,
+                                  str(self.mate.pk): 1},
+                                 self.anna)
+        purchases = Purchase.objects.filter(key=settlement.key).order_by('pk')
+
+        self.assertEqual(settlement.total, Decimal('2.20'))
+        self.assertEqual(settlement.balance, Decimal('-2.20'))
+        self.assertEqual(self.get_balance(self.anna), Decimal('-2.20'))
+        self.assertEqual(list(purchases.values_list('product__name',
+                                                    'quantity',
+                                                    'total_price')),
+                         [('Kaffee', 2, Decimal('1.00')),
+                          ('Mate', 1, Decimal('1.20'))])
+        self.assertEqual(self.get_ledger(),
+                         [('anna', PURCHASE_ENTRY, Decimal('-2.20'),
+                           settlement.key)])
+        self.assertEqual(self.get_purchase_days(),
+                         [('anna', timezone.localdate(), 3,
+                           Decimal('2.20'))])
+        self.assertEqual(get_mismatches(), [])
+
+    def test_deposit(self):
+        settlement = deposit_money(self.anna, '5.00')
+
+        self.assertEqual(settlement.balance, Decimal('5.00'))
+        self.assertEqual(self.get_balance(self.anna), Decimal('5.00'))
+        self.assertEqual(list(Deposit.objects.values_list('user__username',
+                                                          'amount')),
+                         [('anna', Decimal('5.00'))])
+        self.assertEqual(self.get_ledger(),
+                         [('anna', DEPOSIT_ENTRY, Decimal('5.00'), '')])
+        self.assertEqual(get_mismatches(), [])
+
+    def test_deposit_many(self):
+        settlements = deposit_many([(self.anna, '5.00'),
+                                    (self.ben, '2.50'),
+                                    (self.anna, '1.00')])
+
+        self.assertEqual([settlement.balance for settlement in settlements],
+                         [Decimal('5.00'), Decimal('2.50'), Decimal('6.00')])
+        self.assertEqual(self.get_balance(self.anna), Decimal('6.00'))
+        self.assertEqual(self.get_balance(self.ben), Decimal('2.50'))
+        self.assertEqual(Deposit.objects.count(), 3)
+        self.assertEqual(self.get_ledger(),
+                         [('anna', DEPOSIT_ENTRY, Decimal('5.00'), ''),
+                          ('ben', DEPOSIT_ENTRY, Decimal('2.50'), ''),
+                          ('anna', DEPOSIT_ENTRY, Decimal('1.00'), '')])
+        self.assertEqual(get_mismatches(), [])
+
+    def test_cancel(self):
+        deposit_money(self.anna, '5.00')
+        key = charge_cart({str(self.mate.pk): 2}, self.anna).key
+        settlement = cancel_purchase(key)
+
+        self.assertEqual(settlement.total, Decimal('2.40'))
+        self.assertEqual(self.get_balance(self.anna), Decimal('5.00'))
+        self.assertFalse(Purchase.objects.exists())
+        self.assertEqual(self.get_ledger()[1:],
+                         [('anna', PURCHASE_ENTRY, Decimal('-2.40'), key),
+                          ('anna', CANCELLATION_ENTRY, Decimal('2.40'),
+                           key)])
+        self.assertEqual(self.get_purchase_days(),
+                         [('anna', timezone.localdate(), 0, Decimal('0'))])
+        self.assertEqual(get_mismatches(), [])
+        self.assertIsNone(cancel_purchase(key))
+
+    def test_unavailable_products(self):
+        Employee.objects.create(user=self.anna, balance=Decimal('5.00'))
+        Product.objects.filter(pk=self.mate.pk).update(active=False)
+
+        for shopping_cart in [{str(self.coffee.pk): 1, str(self.mate.pk): 1},
+                              {str(self.coffee.pk): 1, '999': 1}]:
+            with self.assertRaises(Product.DoesNotExist):
+                charge_cart(shopping_cart, self.anna)
+
+        self.assertEqual(self.get_balance(self.anna), Decimal('5.00'))
+        self.assertFalse(Purchase.objects.exists())
+        self.assertFalse(LedgerEntry.objects.exists())
+        self.assertFalse(PurchaseDay.objects.exists())
+
+
+@override_settings(**LDAP_SETTINGS)
+class SyncLDAPTest(TestCase):
+    def sync(self, entries, full=False):
+        with tempfile.NamedTemporaryFile('w',
+                                         suffix='.ldif',
+                                         delete=False) as file:
+            file.write('\n'.join(entries))
+
+        try:
+            call_command('syncldap', ldif=file.name, full=full)
+        finally:
+            os.remove(file.name)
+
+    def test_incremental_sync(self):
+        self.sync([get_user_entry('anna', 'Admin', '20240102000000Z'),
+                   get_user_entry('ben', 'Brown', '20240101000000Z'),
+                   get_group_entry('prof', ['anna']),
+                   get_group_entry('stud', ['ben']),
+                   get_group_entry('admins', ['anna'])],
+                  full=True)
+
+        anna = User.objects.get(username='anna')
+        self.assertTrue(anna.is_superuser)
+        self.assertEqual(list(anna.groups.values_list('name', flat=True)),
+                         ['prof'])
+        self.assertEqual(User.objects.get(username='ben').last_name, 'Brown')
+        self.assertEqual(get_sync_timestamp(), '20240102000000Z')
+
+        # Ben's old entry would overwrite a local change if it was read again
+        User.objects.filter(username='ben').update(first_name='Local')
+
+        self.sync([get_user_entry('ben', 'Brown', '20240101000000Z'),
+                   get_user_entry('carl', 'Clark', '20240103000000Z'),
+                   get_group_entry('prof', []),
+                   get_group_entry('stud', ['ben', 'carl']),
+                   get_group_entry('admins', [])])
+
+        self.assertFalse(User.objects.get(username='anna').is_active)
+        self.assertEqual(User.objects.get(username='ben').first_name, 'Local')
+        self.assertEqual(list(User.objects.get(
+            username='carl').groups.values_list('name', flat=True)), ['stud'])
+        self.assertEqual(get_sync_timestamp(), '20240103000000Z')
+
+
+class SeedLoadTest(TestCase):
+    def seed(self, **options):
+        call_command('seedload',
+                     clear=True,
+                     users=5,
+                     products=3,
+                     purchases=50,
+                     deposits=5,
+                     days=10,
+                     **options)
+
+        return list(Purchase.objects.order_by('date').values_list(
+            'date', 'key', 'quantity'))
+
+    def test_same_seed_and_end_date(self):
+        purchases = self.seed(end_date='2024-06-01')
+
+        self.assertEqual(len(purchases), 50)
+        self.assertLess(timezone.localdate(purchases[-1][0]), date(2024, 6, 1))
+        self.assertEqual(self.seed(end_date='2024-06-01'), purchases)
+        self.assertNotEqual(self.seed(end_date='2024-06-02'), purchases)
+
+
+class StressPurchasesTest(TransactionTestCase):
+    def test_production_profile(self):
+        output = io.StringIO()
+        call_command('stresspurchases',
+                     profiles='production',
+                     workers=2,
+                     purchases=10,
+                     users=10,
+                     products=3,
+                     writer=True,
+                     stdout=output)
+
+        self.assertIn('production: 20/20 purchases', output.getvalue())
+        self.assertIn('production+writer: 20/20 purchases',
+                      output.getvalue())
+        self.assertEqual(User.objects.count(), 0)
+
+
+class WriterConnection(list):
+    def send(self, result):
+        self.append(result)
+
+
+class WriterTest(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.address = os.path.join(directory, 'writer.socket')
+        self.user = User.objects.create(username='anna')
+
+    def test_failing_command_rolls_back_its_savepoint(self):
+        product = Product.objects.create(name='Kaffee',
+                                         price=Decimal('0.50'),
+                                         category=1)
+        connection = WriterConnection()
+        Writer(self.address, 10, 0).commit([
+            (connection, 'import_deposits', ([(self.user, '5')],)),
+            (connection, 'purchase', ({'999': 1}, self.user, '')),
+            (connection, 'purchase', ({str(product.pk): 2}, self.user, ''))])
+
+        self.assertEqual([succeeded for succeeded, _ in connection],
+                         [True, False, True])
+        self.assertIsInstance(connection[1][1], Product.DoesNotExist)
+        self.assertEqual(Deposit.objects.count(), 1)
+        self.assertEqual(Purchase.objects.get().quantity, 2)
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+        self.assertEqual(Employee.objects.get().balance, Decimal('4.00'))
+
+    def test_unreachable_writer(self):
+        with override_settings(WRITER_ADDRESS=self.address):
+            with self.assertLogs('writer', 'WARNING'):
+                execute('deposit', self.user, Decimal('5'))
+
+        self.assertEqual(Deposit.objects.count(), 1)
+
+    def test_lost_result(self):
+        listener = Listener(self.address, 'AF_UNIX', authkey=get_authkey())
+
+        # The writer receives the command and stops before it answers
+        def stop():
+            connection = listener.accept()
+            connection.recv()
+            connection.close()
+
+        thread = threading.Thread(target=stop)
+        thread.start()
+
+        try:
+            with override_settings(WRITER_ADDRESS=self.address):
+                with self.assertRaises(WriterError):
+                    execute('deposit', self.user, Decimal('5'))
+        finally:
+            thread.join()
+            listener.close()
+
+        self.assertEqual(Deposit.objects.count(), 0)
@@ -1,27 +1,61 @@
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from django.urls import path
 
+from .asyncviews import (AsyncAddToCartView,
+                         AsyncCheckoutView,
+                         AsyncConfirmView,
+                         AsyncIndexView,
+                         AsyncPurchaseView)
 from .views import (AdminAccountsView,
                     AddToCartView,
+                    AdminPurchasesExportView,
+                    AdminPurchasesHistoryView,
                     AdminPurchasesView,
                     CancelPurchaseView,
                     CheckoutView,
                     ConfirmView,
+                    AdminDepositsExportView,
+                    AdminDepositsImportView,
                     AdminDepositsView,
                     AdminProductsView,
                     CustomLoginView,
                     IndexView,
+                    MetricsView,
+                    ProfilePurchasesHistoryView,
                     ProfileView,
                     PurchaseView,
-                    RedirectView)
+                    RedirectView,
+                    StatementView,
+                    UserSearchView)
+
+# The kiosk pages don't block a thread while waiting when served with ASGI
+if settings.ASYNC_VIEWS:
+    AddToCartView = AsyncAddToCartView
+    CheckoutView = AsyncCheckoutView
+    ConfirmView = AsyncConfirmView
+    IndexView = AsyncIndexView
+    PurchaseView = AsyncPurchaseView
 
 urlpatterns = [
     path('admin/accounts/', AdminAccountsView.as_view(), name='admin-accounts'),
     path('admin/deposits/', AdminDepositsView.as_view(), name='admin-deposits'),
+    path('admin/deposits/export/',
+         AdminDepositsExportView.as_view(),
+         name='admin-deposits-export'),
+    path('admin/deposits/import/',
+         AdminDepositsImportView.as_view(),
+         name='admin-deposits-import'),
     path('admin/products/', AdminProductsView.as_view(), name='admin-products'),
     path('admin/purchases/',
          AdminPurchasesView.as_view(),
          name='admin-purchases'),
+    path('admin/purchases/export/',
+         AdminPurchasesExportView.as_view(),
+         name='admin-purchases-export'),
+    path('admin/purchases/history/',
+         AdminPurchasesHistoryView.as_view(),
+         name='admin-purchases-history'),
 
     path('add-to-cart/', AddToCartView.as_view(), name='add-to-cart'),
     path('cancel-purchase/<str:key>/',
@@ -36,8 +70,16 @@ urlpatterns = [
     path('logout/',
          auth_views.LogoutView.as_view(next_page='chiffee:index'),
          name='logout'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('profile/history/',
+         ProfilePurchasesHistoryView.as_view(),
+         name='profile-history'),
     path('purchase/', PurchaseView.as_view(), name='purchase'),
     path('redirect/', RedirectView.as_view(), name='redirect'),
+    path('statements/<int:pk>.<str:extension>',
+         StatementView.as_view(),
+         name='statement'),
+    path('users/search/', UserSearchView.as_view(), name='user-search'),
     path('', IndexView.as_view(), name='index'),
 ]
@@ -0,0 +1,87 @@
+import bisect
+import itertools
+import unicodedata
+
+from .caching import bump_version, get_versioned
+from .models import User
+
+USER_SEARCH_CACHE = 'user-search'
+USER_SEARCH_LIMIT = 20
+USER_SEARCH_TIMEOUT = 24 * 60 * 60
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+
+    return ''.join(character for character in text
+                   if not unicodedata.combining(character)).casefold()
+
+
+class UserSearchIndex:
+    def __init__(self, rows):
+        self.labels = {}
+        self.active = set()
+        self.terms = {}
+        entries = []
+
+        for pk, username, first_name, last_name, is_active in rows:
+            self.labels[pk] = f'{last_name}, {first_name}'
+            self.terms[pk] = set(normalize(
+                f'{username} {first_name} {last_name}').split())
+
+            if is_active:
+                self.active.add(pk)
+
+            entries.extend((term, pk) for term in self.terms[pk])
+
+        entries.sort()
+        self.entries = entries
+        self.keys = [term for term, _ in entries]
+
+    def get_label(self, pk):
+        return self.labels.get(pk)
+
+    def search(self, query, active=False, limit=USER_SEARCH_LIMIT):
+        prefixes = normalize(query).replace(',', ' ').split()
+
+        if len(prefixes) == 0:
+            return []
+
+        longest = max(prefixes, key=len)
+        start = bisect.bisect_left(self.keys, longest)
+        pks = set()
+
+        for term, pk in itertools.islice(self.entries, start, None):
+            if not term.startswith(longest):
+                break
+
+            pks.add(pk)
+
+        if active:
+            pks &= self.active
+
+        matches = [pk for pk in pks
+                   if all(any(term.startswith(prefix)
+                              for term in self.terms[pk])
+                          for prefix in prefixes)]
+        matches.sort(key=lambda pk: (normalize(self.labels[pk]), pk))
+
+        return [(pk, self.labels[pk]) for pk in matches[:limit]]
+
+
+def build_user_search_index():
+    return UserSearchIndex(User.objects.values_list('pk',
+                                                    'username',
+                                                    'first_name',
+                                                    'last_name',
+                                                    'is_active'))
+
+
+def get_user_search_index():
+    return get_versioned(USER_SEARCH_CACHE,
+                         build_user_search_index,
+                         USER_SEARCH_TIMEOUT)
+
+
+def invalidate_user_search():
+    bump_version(USER_SEARCH_CACHE)
@@ -1,48 +1,114 @@
 import os
-import secrets
-from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.mail import send_mail
 from django.core.paginator import Paginator
-from django.db import OperationalError
+from django.db import transaction
+from django.http import (Http404, HttpResponse, HttpResponseForbidden,
+                         JsonResponse)
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect, render, reverse
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
 from django.views import View
 
 from chiffee import forms
 from coffee.settings import MEDIA_URL
-from .filters import PurchaseFilter
-from .forms import DepositForm, InactiveProductsForm
-from .models import (CATEGORIES, Deposit, Employee, Product, Purchase,
-                     USER_PICTURES_DIR, User)
-
-EMAIL_ADDRESS = 'kaffeekasse@chi.uni-hannover.de'
-EMAIL_SUBJECT = 'Kauf Kaffeekasse'
+from .cart import get_cart_key, price_cart
+from .catalog import get_catalog_grid
+from .exports import (DEPOSIT_COLUMNS, EXPORT_FORMATS, PURCHASE_COLUMNS,
+                      export)
+from .filters import DepositFilter, PurchaseFilter
+from .forms import DepositForm, DepositImportForm, InactiveProductsForm
+from .metrics import generate_metrics
+from .models import (CATEGORIES, Employee, Product, Purchase, PurchaseDay,
+                     Statement, USER_PICTURES_DIR, User)
+from .outbox import queue_email, queue_emails
+from .pagination import get_keyset_page, get_query_params
+from .pictures import delete_picture
+from .purchases import (cancel_purchase, charge_cart, deposit_many,
+                        deposit_money)
+from .roster import get_roster
+from .statements import STATEMENT_FORMATS
+from .staticfiles import serve_private_media
+from .usersearch import get_user_search_index
+from .writer import WriterError, execute
 
 PAGES_TOTAL = 7
 
 
-def count_shopping_cart(shopping_cart):
-    if shopping_cart is None:
-        return 0
+class PurchaseGroup(list):
+    def __init__(self, date, user_id):
+        super().__init__()
+        self.date = date
+        self.user_id = user_id
+        self.total = 0
+        self.purchase_day = None
+
+
+@transaction.atomic
+def cancel_products(key):
+    settlement = cancel_purchase(key)
+
+    if settlement is None:
+        return False
+
+    user = settlement.user
+    cancelled_purchases = ''
+
+    for quantity, product, total_price in settlement.lines:
+        cancelled_purchases += (f'{quantity} '
+                                f'{product.name} '
+                                f'für €{total_price}\n')
+
+    message = (f'Hallo {user.first_name} {user.last_name}!\n\n'
+               f'Sie haben den folgenden Kauf erfolgreich storniert:\n'
+               f'{cancelled_purchases}\n'
+               f'Ihr aktueller Kontostand beträgt €{settlement.balance}.')
+
+    queue_email(user.email, message)
+
+    return True
+
+
+@transaction.atomic
+def deposit_to_account(user, deposit):
+    settlement = deposit_money(user, deposit)
+
+    if settlement.employee.get_emails_deposits:
+        queue_email(user.email, get_deposit_message(settlement))
 
-    return sum(shopping_cart.values())
 
+def get_checkout_context(request, username):
+    cart = price_cart(request.cart.get_items())
 
-def generate_key():
-    while True:
-        key = secrets.token_hex(32)
+    for key in cart.stale:
+        request.cart.remove(key)
 
+    paginator = Paginator(cart.lines, 10)
+
+    current_page = get_current_page(request.GET.get('page'),
+                                    paginator.num_pages)
+
+    context = {'check': cart.total,
+               'current_page': current_page,
+               'pages': get_pages(current_page, paginator.num_pages),
+               'shopping_cart': paginator.page(current_page).object_list,
+               'shopping_cart_counter': request.cart.count(),
+               'users': get_roster()}
+
+    if username is not None:
         try:
-            if not Purchase.objects.filter(key=key).exists():
-                break
-        except OperationalError:
-            break
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            return None
+
+        context['username'] = user.username
 
-    return key
+    return context
 
 
 def get_current_page(page, pages_total):
@@ -64,6 +130,14 @@ def get_current_page(page, pages_total):
     return current_page
 
 
+def get_deposit_message(settlement):
+    user = settlement.user
+
+    return (f'Hallo {user.first_name} {user.last_name}!\n\n'
+            f'Geld wurde auf Ihr Konto eingezahlt: €{settlement.total}\n\n'
+            f'Ihr aktueller Kontostand beträgt €{settlement.balance}.')
+
+
 def get_pages(current_page, pages_total):
     if pages_total <= PAGES_TOTAL:
         pages = [page for page in range(1, pages_total + 1)]
@@ -92,77 +166,140 @@ def get_pages(current_page, pages_total):
     return pages
 
 
-def get_check(shopping_cart):
-    check = 0
+def get_purchase_cart(request):
+    if 'username' not in request.POST and not request.user.is_authenticated:
+        return None, None
+
+    if request.user.is_authenticated:
+        user = request.user
+    else:
+        try:
+            user = User.objects.get(username=request.POST['username'])
+        except User.DoesNotExist:
+            return None, None
+
+    if 'product' not in request.POST:
+        return None, None
+
+    try:
+        product = Product.objects.get(name=request.POST['product'],
+                                      active=True)
+    except Product.DoesNotExist:
+        return None, None
+
+    return {get_cart_key(product): 1}, user
 
-    for product_name, quantity in shopping_cart.items():
-        product = Product.objects.get(name=product_name)
-        check += product.price * quantity
 
-    return check
+def get_purchase_context(request, name):
+    try:
+        product = Product.objects.get(name=name, active=True)
+    except Product.DoesNotExist:
+        return None
 
+    return {'product': product.name,
+            'shopping_cart_counter': request.cart.count(),
+            'users': get_roster()}
 
-def get_users():
-    groups = ['prof', 'wimi', 'stud']
-    users = User.objects.filter(groups__name__in=groups,
-                                is_active=True).order_by('last_name',
-                                                         'first_name')
 
-    return users
+def get_purchases_page(request, purchases):
+    return get_keyset_page(purchases,
+                           after=request.GET.get('after'),
+                           before=request.GET.get('before'))
 
 
 def group_purchases_by_date(purchases):
-    distinct_dates = set([purchase.date for purchase in purchases])
     purchases_grouped = []
 
-    for date in sorted(distinct_dates, reverse=True):
-        group = []
+    for purchase in purchases:
+        if (len(purchases_grouped) == 0
+                or purchases_grouped[-1].date != purchase.date
+                or purchases_grouped[-1].user_id != purchase.user_id):
+            purchases_grouped.append(PurchaseGroup(purchase.date,
+                                                   purchase.user_id))
+
+        purchases_grouped[-1].append(purchase)
+        purchases_grouped[-1].total += purchase.total_price
 
-        for purchase in purchases:
-            if purchase.date == date:
-                group.append(purchase)
+    if len(purchases_grouped) == 0:
+        return purchases_grouped
 
-        purchases_grouped.append(group)
+    days = {(group.user_id, timezone.localdate(group.date))
+            for group in purchases_grouped}
+    purchase_days = {
+        (purchase_day.user_id, purchase_day.date): purchase_day
+        for purchase_day in PurchaseDay.objects.filter(
+            user__in={user_id for user_id, _ in days},
+            date__in={date for _, date in days})}
+
+    for group in purchases_grouped:
+        day = (group.user_id, timezone.localdate(group.date))
+
+        if day in days:
+            group.purchase_day = purchase_days.get(day)
+            days.remove(day)
 
     return purchases_grouped
 
 
-def purchase_products(shopping_cart, user, employee, url):
-    now = timezone.now()
-    key = generate_key()
-    check = 0
+def has_metrics_token(request):
+    if not settings.METRICS_TOKEN:
+        return False
+
+    return constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''),
+                                 f'Bearer {settings.METRICS_TOKEN}')
+
+
+@transaction.atomic
+def import_deposits(deposits):
+    settlements = deposit_many(deposits)
+    queue_emails([(settlement.user.email, get_deposit_message(settlement))
+                  for settlement in settlements
+                  if settlement.employee.get_emails_deposits])
+
+    return settlements
+
+
+@transaction.atomic
+def purchase_products(shopping_cart, user, url):
+    settlement = charge_cart(shopping_cart, user)
     purchases = ''
 
-    for product_name, quantity in shopping_cart.items():
-        product = Product.objects.get(name=product_name)
-        total_price = product.price * quantity
-        check += total_price
+    for quantity, product, total_price in settlement.lines:
         purchases += f'{quantity} {product.name} für €{total_price}\n'
-        Purchase.objects.create(user=user,
-                                product=product,
-                                quantity=quantity,
-                                total_price=total_price,
-                                date=now,
-                                key=key)
-
-    employee.balance -= check
-    employee.save()
 
-    url += reverse('chiffee:cancel-purchase', kwargs={'key': key})
+    url += reverse('chiffee:cancel-purchase', kwargs={'key': settlement.key})
 
-    if employee.get_emails_purchases:
+    if settlement.employee.get_emails_purchases:
         message = (f'Hallo {user.first_name} {user.last_name}!\n\n'
                    f'Sie haben diese Produkte gekauft:\n'
                    f'{purchases}\n'
-                   f'Ihr aktueller Kontostand beträgt €{employee.balance}.\n\n'
+                   f'Ihr aktueller Kontostand beträgt '
+                   f'€{settlement.balance}.\n\n'
                    f'Wenn Sie diesen Kauf stornieren möchten, '
                    f'klicken Sie bitte hier: {url}')
 
-        send_mail(EMAIL_SUBJECT,
-                  message,
-                  EMAIL_ADDRESS,
-                  [user.email],
-                  fail_silently=False)
+        queue_email(user.email, message)
+
+
+def render_pending(request):
+    # The writer may still commit the command, so it must not be repeated
+    context = {'pending': True,
+               'shopping_cart_counter': request.cart.count()}
+
+    return render(request, 'chiffee/redirect.html', context)
+
+
+def render_purchases_history(request, purchases, show_user=False):
+    page = get_purchases_page(request, purchases)
+    context = {'categories': CATEGORIES,
+               'purchases': group_purchases_by_date(page),
+               'show_user': show_user}
+
+    return JsonResponse({'html': render_to_string(
+                             'chiffee/purchase-groups.html', context, request),
+                         'next': page.next_cursor if page.has_next else None,
+                         'previous': (page.previous_cursor
+                                      if page.has_previous else None)})
 
 
 class AdminAccountsView(View):
@@ -171,17 +308,22 @@ class AdminAccountsView(View):
     @method_decorator(login_required)
     @method_decorator(user_passes_test(lambda user: user.is_superuser))
     def get(self, request, *args, **kwargs):
-        users = get_users()
-        paginator = Paginator(users, 10)
+        paginator = Paginator(get_roster(), 10)
 
         current_page = get_current_page(request.GET.get('page'),
                                         paginator.num_pages)
 
-        context = {'current_page': current_page,
+        # The cached roster has no balances, they change with every purchase
+        users = paginator.page(current_page).object_list
+        balances = dict(Employee.objects.filter(
+            user__in=[user.pk for user in users]).values_list('user',
+                                                              'balance'))
+
+        context = {'accounts': [(user, balances.get(user.pk))
+                                for user in users],
+                   'current_page': current_page,
                    'pages': get_pages(current_page, paginator.num_pages),
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart')),
-                   'users': paginator.page(current_page).object_list}
+                   'shopping_cart_counter': request.cart.count()}
 
         return render(request, self.template_name, context)
 
@@ -191,18 +333,12 @@ class AddToCartView(View):
         if 'product' not in request.POST:
             return RedirectView.as_view()(request)
         try:
-            product = Product.objects.get(name=request.POST['product'])
-        except Product.DoesNotExist:
+            product = Product.objects.get(pk=request.POST['product'],
+                                          active=True)
+        except (Product.DoesNotExist, ValueError):
             return RedirectView.as_view()(request)
 
-        shopping_cart = request.session.get('shopping_cart', {})
-
-        if product.name in shopping_cart:
-            shopping_cart[product.name] += 1
-        else:
-            shopping_cart[product.name] = 1
-
-        request.session['shopping_cart'] = shopping_cart
+        request.cart.increment(get_cart_key(product))
 
         return redirect(reverse('chiffee:index'))
 
@@ -214,8 +350,7 @@ class AdminDepositsView(View):
     @method_decorator(user_passes_test(lambda user: user.is_superuser))
     def get(self, request, *args, **kwargs):
         context = {'form': forms.DepositForm(),
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart'))}
+                   'shopping_cart_counter': request.cart.count()}
 
         return render(request, self.template_name, context)
 
@@ -231,31 +366,89 @@ class AdminDepositsView(View):
 
             if deposit != 0:
                 try:
-                    employee = user.employee
-                except Employee.DoesNotExist:
-                    employee = Employee.objects.create(user=user)
+                    execute('deposit', user, deposit)
+                except WriterError:
+                    return render_pending(request)
 
-                employee.balance += Decimal(deposit)
-                employee.save()
+                return RedirectView.as_view()(request, success=True)
+
+        return RedirectView.as_view()(request)
+
+
+class AdminDepositsExportView(View):
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
 
-                Deposit.objects.create(user=user, amount=deposit)
+        if export_format not in EXPORT_FORMATS:
+            return RedirectView.as_view()(request)
 
-                if employee.get_emails_deposits:
-                    message = (f'Hallo {user.first_name} {user.last_name}!\n\n'
-                               f'Geld wurde auf Ihr Konto eingezahlt: '
-                               f'€{deposit}\n\n'
-                               f'Ihr aktueller Kontostand beträgt '
-                               f'€{employee.balance}.')
+        return export(DepositFilter(request.GET).qs,
+                      DEPOSIT_COLUMNS,
+                      'deposits',
+                      export_format)
 
-                    send_mail(EMAIL_SUBJECT,
-                              message,
-                              EMAIL_ADDRESS,
-                              [user.email],
-                              fail_silently=False)
 
-                return RedirectView.as_view()(request, success=True)
+class AdminDepositsImportView(View):
+    template_name = 'chiffee/admin-deposits-import.html'
 
-        return RedirectView.as_view()(request)
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
+    def get(self, request, *args, **kwargs):
+        request.session.pop('deposit_import', None)
+
+        context = {'form': DepositImportForm(),
+                   'shopping_cart_counter': request.cart.count()}
+
+        return render(request, self.template_name, context)
+
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
+    def post(self, request, *args, **kwargs):
+        if 'confirm' in request.POST:
+            deposits = request.session.pop('deposit_import', None)
+
+            if deposits is None:
+                return RedirectView.as_view()(request)
+
+            users = User.objects.filter(
+                pk__in=[pk for pk, _ in deposits],
+                is_active=True).in_bulk()
+
+            if any(pk not in users for pk, _ in deposits):
+                return RedirectView.as_view()(request)
+
+            try:
+                execute('import_deposits',
+                        [(users[pk], amount) for pk, amount in deposits])
+            except WriterError:
+                return render_pending(request)
+
+            return RedirectView.as_view()(request, success=True)
+        elif 'cancel' in request.POST:
+            request.session.pop('deposit_import', None)
+
+            return redirect(reverse('chiffee:admin-deposits'))
+
+        form = DepositImportForm(request.POST, request.FILES)
+        context = {'form': form,
+                   'shopping_cart_counter': request.cart.count()}
+
+        if form.is_valid():
+            deposits = form.cleaned_data['file']
+            context['deposits'] = deposits
+            context['total'] = sum(deposit['amount'] or 0
+                                   for deposit in deposits)
+            context['valid'] = all(deposit['error'] is None
+                                   for deposit in deposits)
+
+            if context['valid']:
+                request.session['deposit_import'] = [
+                    (deposit['user'].pk, str(deposit['amount']))
+                    for deposit in deposits]
+
+        return render(request, self.template_name, context)
 
 
 class AdminProductsView(View):
@@ -275,8 +468,7 @@ class AdminProductsView(View):
                    'current_page': current_page,
                    'pages': get_pages(current_page, paginator.num_pages),
                    'active_products': paginator.page(current_page).object_list,
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart'))}
+                   'shopping_cart_counter': request.cart.count()}
 
         if len(Product.objects.filter(active=False)) > 0:
             context['inactive_products'] = InactiveProductsForm()
@@ -333,57 +525,55 @@ class AdminPurchasesView(View):
     @method_decorator(user_passes_test(lambda user: user.is_superuser))
     def get(self, request, *args, **kwargs):
         purchase_filter = PurchaseFilter(request.GET)
-        purchases = purchase_filter.qs
-        paginator = Paginator(purchases, 10)
-
-        current_page = get_current_page(request.GET.get('page'),
-                                        paginator.num_pages)
+        page = get_purchases_page(
+            request,
+            purchase_filter.qs.select_related('product', 'user'))
 
         context = {'categories': CATEGORIES,
-                   'current_page': current_page,
                    'filter': purchase_filter,
-                   'pages': get_pages(current_page, paginator.num_pages),
-                   'purchases': group_purchases_by_date(
-                       paginator.page(current_page).object_list),
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart'))}
+                   'page': page,
+                   'purchases': group_purchases_by_date(page),
+                   'query_params': get_query_params(request.GET),
+                   'shopping_cart_counter': request.cart.count()}
 
         return render(request, self.template_name, context)
 
 
-class CancelPurchaseView(View):
+class AdminPurchasesHistoryView(View):
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
     def get(self, request, *args, **kwargs):
-        if kwargs.get('key') is None:
-            return RedirectView.as_view()(request)
+        purchases = PurchaseFilter(request.GET).qs.select_related('product',
+                                                                  'user')
 
-        purchases = Purchase.objects.filter(key=kwargs.get('key'))
+        return render_purchases_history(request, purchases, show_user=True)
 
-        if not purchases.exists():
-            return RedirectView.as_view()(request)
 
-        user = purchases[0].user
-        employee = user.employee
-        cancelled_purchases = ''
+class AdminPurchasesExportView(View):
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+
+        if export_format not in EXPORT_FORMATS:
+            return RedirectView.as_view()(request)
 
-        for purchase in purchases:
-            employee.balance += purchase.total_price
-            cancelled_purchases += (f'{purchase.quantity} '
-                                    f'{purchase.product.name} '
-                                    f'für €{purchase.total_price}\n')
-            purchase.delete()
+        return export(PurchaseFilter(request.GET).qs,
+                      PURCHASE_COLUMNS,
+                      'purchases',
+                      export_format)
 
-        employee.save()
 
-        message = (f'Hallo {user.first_name} {user.last_name}!\n\n'
-                   f'Sie haben den folgenden Kauf erfolgreich storniert:\n'
-                   f'{cancelled_purchases}\n'
-                   f'Ihr aktueller Kontostand beträgt €{employee.balance}.')
+class CancelPurchaseView(View):
+    def get(self, request, *args, **kwargs):
+        if kwargs.get('key') is None:
+            return RedirectView.as_view()(request)
 
-        send_mail(EMAIL_SUBJECT,
-                  message,
-                  EMAIL_ADDRESS,
-                  [user.email],
-                  fail_silently=False)
+        try:
+            if not execute('cancel', kwargs.get('key')):
+                return RedirectView.as_view()(request)
+        except WriterError:
+            return render_pending(request)
 
         return RedirectView.as_view()(request, success=True)
 
@@ -392,77 +582,22 @@ class CheckoutView(View):
     template_name = 'chiffee/checkout.html'
 
     def get(self, request, *args, **kwargs):
-        shopping_cart = request.session.get('shopping_cart', {})
-        paginator = Paginator(tuple(shopping_cart.items()), 10)
-
-        current_page = get_current_page(request.GET.get('page'),
-                                        paginator.num_pages)
-
-        context = {'check': get_check(shopping_cart),
-                   'current_page': current_page,
-                   'pages': get_pages(current_page, paginator.num_pages),
-                   'shopping_cart': dict(
-                       paginator.page(current_page).object_list),
-                   'shopping_cart_counter': count_shopping_cart(shopping_cart),
-                   'users': get_users()}
-
-        if kwargs.get('username') is not None:
-            try:
-                user = User.objects.get(username=kwargs.get('username'))
-            except User.DoesNotExist:
-                return RedirectView.as_view()(request)
+        context = get_checkout_context(request, kwargs.get('username'))
 
-            context['username'] = user.username
+        if context is None:
+            return RedirectView.as_view()(request)
 
         return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
         if 'decrease' in request.POST:
-            try:
-                product = Product.objects.get(name=request.POST['decrease'])
-            except Product.DoesNotExist:
-                return RedirectView.as_view()(request)
-
-            shopping_cart = request.session.get('shopping_cart', {})
-
-            if product.name in shopping_cart:
-                shopping_cart[product.name] -= 1
-
-                if shopping_cart[product.name] == 0:
-                    shopping_cart.pop(product.name)
-
-                request.session['shopping_cart'] = shopping_cart
+            request.cart.decrement(request.POST['decrease'])
         elif 'increase' in request.POST:
-            try:
-                product = Product.objects.get(name=request.POST['increase'])
-            except Product.DoesNotExist:
-                return RedirectView.as_view()(request)
-
-            shopping_cart = request.session.get('shopping_cart', {})
-
-            if product.name in shopping_cart:
-                shopping_cart[product.name] += 1
-                request.session['shopping_cart'] = shopping_cart
+            request.cart.increment(request.POST['increase'], create=False)
         elif 'delete' in request.POST:
-            try:
-                product = Product.objects.get(name=request.POST['delete'])
-            except Product.DoesNotExist:
-                return RedirectView.as_view()(request)
-
-            shopping_cart = request.session.get('shopping_cart', {})
-
-            if product.name in shopping_cart:
-                shopping_cart.pop(product.name)
-                request.session['shopping_cart'] = shopping_cart
+            request.cart.remove(request.POST['delete'])
         elif 'username' in request.POST:
-            try:
-                user = User.objects.get(username=request.POST['username'])
-            except User.DoesNotExist:
-                return RedirectView.as_view()(request)
-
-            return CheckoutView.get(CheckoutView(),
-                                    request,
-                                    username=user.username)
+            return self.get(request, username=request.POST['username'])
 
         return redirect(reverse('chiffee:checkout'))
 
@@ -478,28 +613,29 @@ class ConfirmView(View):
             except User.DoesNotExist:
                 return RedirectView.as_view()(request)
 
-            try:
-                employee = user.employee
-            except Employee.DoesNotExist:
-                employee = Employee.objects.create(user=user)
+            shopping_cart = request.cart.get_items()
 
-            shopping_cart = request.session.get('shopping_cart')
+            if len(shopping_cart) == 0:
+                return RedirectView.as_view()(request)
 
-            if shopping_cart is None:
+            try:
+                execute('purchase',
+                        shopping_cart,
+                        user,
+                        request.get_raw_uri().replace(request.get_full_path(),
+                                                      ''))
+            except Product.DoesNotExist:
                 return RedirectView.as_view()(request)
+            except WriterError:
+                request.cart.clear()
 
-            purchase_products(shopping_cart,
-                              user,
-                              employee,
-                              request.get_raw_uri().replace(
-                                  request.get_full_path(),
-                                  ''))
+                return render_pending(request)
 
-            request.session.pop('shopping_cart')
+            request.cart.clear()
 
             return RedirectView.as_view()(request, success=True)
         elif 'cancel' in request.POST:
-            request.session.pop('shopping_cart', None)
+            request.cart.clear()
 
             return redirect(reverse('chiffee:index'))
 
@@ -522,15 +658,24 @@ class IndexView(View):
     template_name = 'chiffee/index.html'
 
     def get(self, request, *args, **kwargs):
-        context = {'categories': CATEGORIES,
-                   'products': Product.objects.filter(active=True).order_by(
-                       'category', 'name'),
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart'))}
+        context = {'catalog_grid': get_catalog_grid(
+                       request.user.is_authenticated,
+                       get_token(request)),
+                   'shopping_cart_counter': request.cart.count()}
 
         return render(request, self.template_name, context)
 
 
+class MetricsView(View):
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff and not has_metrics_token(request):
+            return HttpResponseForbidden()
+
+        metrics, content_type = generate_metrics()
+
+        return HttpResponse(metrics, content_type=content_type)
+
+
 class ProfileView(View):
     template_name = 'chiffee/profile.html'
 
@@ -541,27 +686,25 @@ class ProfileView(View):
         except Employee.DoesNotExist:
             balance = 0
 
-        purchases = Purchase.objects.filter(user=request.user)
-        paginator = Paginator(purchases, 10)
-
-        current_page = get_current_page(request.GET.get('page'),
-                                        paginator.num_pages)
+        page = get_purchases_page(
+            request,
+            Purchase.objects.filter(user=request.user).select_related(
+                'product'))
 
         context = {
             'balance': balance,
             'categories': CATEGORIES,
-            'current_page': current_page,
             'form': forms.PictureForm(),
             'get_emails_deposits': request.user.employee.get_emails_deposits,
             'get_emails_purchases': request.user.employee.get_emails_purchases,
-            'pages': get_pages(current_page, paginator.num_pages),
+            'page': page,
             'placeholder_picture': os.path.join(MEDIA_URL,
                                                 USER_PICTURES_DIR,
                                                 'placeholder.jpg'),
-            'purchases': group_purchases_by_date(
-                paginator.page(current_page).object_list),
-            'shopping_cart_counter': count_shopping_cart(
-                request.session.get('shopping_cart'))}
+            'purchases': group_purchases_by_date(page),
+            'query_params': get_query_params(request.GET),
+            'shopping_cart_counter': request.cart.count(),
+            'statement': Statement.objects.filter(user=request.user).first()}
 
         return render(request, self.template_name, context)
 
@@ -570,12 +713,13 @@ class ProfileView(View):
         employee = Employee.objects.get(user=request.user)
 
         if 'delete' in request.POST:
-            employee.picture.delete()
+            delete_picture(employee)
+            employee.save()
         elif 'picture' in request.FILES:
             form = forms.PictureForm(request.POST, request.FILES)
 
             if form.is_valid():
-                employee.picture.delete()
+                delete_picture(employee)
                 employee.picture = request.FILES['picture']
                 employee.save()
         else:
@@ -589,11 +733,21 @@ class ProfileView(View):
             else:
                 employee.get_emails_deposits = False
 
-            employee.save()
+            employee.save(update_fields=['get_emails_deposits',
+                                         'get_emails_purchases'])
 
         return redirect(reverse('chiffee:profile'))
 
 
+class ProfilePurchasesHistoryView(View):
+    @method_decorator(login_required)
+    def get(self, request, *args, **kwargs):
+        purchases = Purchase.objects.filter(
+            user=request.user).select_related('product')
+
+        return render_purchases_history(request, purchases)
+
+
 class PurchaseView(View):
     template_name = 'chiffee/purchase.html'
 
@@ -601,51 +755,33 @@ class PurchaseView(View):
         if 'product' not in request.GET:
             return RedirectView.as_view()(request)
 
-        try:
-            product = Product.objects.get(name=request.GET['product'])
-        except Product.DoesNotExist:
-            return RedirectView.as_view()(request)
+        context = get_purchase_context(request, request.GET['product'])
 
-        context = {'product': product.name,
-                   'shopping_cart_counter': count_shopping_cart(
-                       request.session.get('shopping_cart')),
-                   'users': get_users()}
+        if context is None:
+            return RedirectView.as_view()(request)
 
         return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
-        if 'username' not in request.POST and not request.user.is_authenticated:
-            return RedirectView.as_view()(request)
+        shopping_cart, user = get_purchase_cart(request)
 
-        if request.user.is_authenticated:
-            user = request.user
-        else:
-            try:
-                user = User.objects.get(username=request.POST['username'])
-            except User.DoesNotExist:
-                return RedirectView.as_view()(request)
-
-        try:
-            employee = user.employee
-        except Employee.DoesNotExist:
-            employee = Employee.objects.create(user=user)
-
-        if 'product' not in request.POST:
+        if shopping_cart is None:
             return RedirectView.as_view()(request)
 
         try:
-            product = Product.objects.get(name=request.POST['product'])
+            execute('purchase',
+                    shopping_cart,
+                    user,
+                    request.get_raw_uri().replace(request.get_full_path(),
+                                                  ''))
         except Product.DoesNotExist:
             return RedirectView.as_view()(request)
+        except WriterError:
+            request.cart.clear()
 
-        shopping_cart = {product.name: 1}
-        purchase_products(shopping_cart,
-                          user,
-                          employee,
-                          request.get_raw_uri().replace(request.get_full_path(),
-                                                        ''))
+            return render_pending(request)
 
-        request.session.pop('shopping_cart', None)
+        request.cart.clear()
 
         return RedirectView.as_view()(request, success=True)
 
@@ -658,8 +794,7 @@ class RedirectView(View):
         if kwargs.get('success') is not None and kwargs.get('success') is True:
             self.context['success'] = True
 
-        self.context['shopping_cart_counter'] = count_shopping_cart(
-            request.session.get('shopping_cart'))
+        self.context['shopping_cart_counter'] = request.cart.count()
 
         return render(request, self.template_name, self.context)
 
@@ -667,7 +802,35 @@ class RedirectView(View):
         if kwargs.get('success') is not None and kwargs.get('success') is True:
             self.context['success'] = True
 
-        self.context['shopping_cart'] = count_shopping_cart(
-            request.session.get('shopping_cart'))
+        self.context['shopping_cart'] = request.cart.count()
 
         return render(request, self.template_name, self.context)
+
+
+class StatementView(View):
+    @method_decorator(login_required)
+    def get(self, request, *args, **kwargs):
+        if kwargs['extension'] not in STATEMENT_FORMATS:
+            raise Http404()
+
+        try:
+            statement = Statement.objects.get(pk=kwargs['pk'])
+        except Statement.DoesNotExist:
+            raise Http404()
+
+        if statement.user_id != request.user.pk and not request.user.is_staff:
+            raise Http404()
+
+        return serve_private_media(request,
+                                   f'{statement.name}.{kwargs["extension"]}')
+
+
+class UserSearchView(View):
+    @method_decorator(login_required)
+    @method_decorator(user_passes_test(lambda user: user.is_superuser))
+    def get(self, request, *args, **kwargs):
+        users = get_user_search_index().search(request.GET.get('q', ''),
+                                               'active' in request.GET)
+
+        return JsonResponse({'results': [{'id': pk, 'text': label}
+                                         for pk, label in users]})
@@ -0,0 +1,161 @@
+import logging
+import pickle
+import queue
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+COMMANDS = {'cancel': 'chiffee.views.cancel_products',
+            'deposit': 'chiffee.views.deposit_to_account',
+            'import_deposits': 'chiffee.views.import_deposits',
+            'purchase': 'chiffee.views.purchase_products'}
+
+logger = logging.getLogger('writer')
+
+local = threading.local()
+
+
+class WriterError(Exception):
+    pass
+
+
+def get_authkey():
+    return salted_hmac('chiffee.writer', 'authkey').digest()
+
+
+def run_command(name, args):
+    return import_string(COMMANDS[name])(*args)
+
+
+def get_connection():
+    connection = getattr(local, 'connection', None)
+
+    # Nothing is ever sent unasked, so a readable connection was closed by
+    # the writer, e.g. when it was restarted
+    if connection is not None and connection.poll():
+        connection.close()
+        connection = None
+
+    if connection is None:
+        connection = Client(settings.WRITER_ADDRESS,
+                            'AF_UNIX',
+                            authkey=get_authkey())
+        local.connection = connection
+
+    return connection
+
+
+def execute(name, *args):
+    if settings.WRITER_ADDRESS is None:
+        return run_command(name, args)
+
+    try:
+        connection = get_connection()
+        connection.send((name, args))
+    except (OSError, EOFError, AuthenticationError) as error:
+        local.connection = None
+        logger.warning(f'Writer unavailable, running {name} directly: '
+                       f'{error}')
+
+        return run_command(name, args)
+
+    # The command may already be committed, so it must not be run again
+    try:
+        if connection.poll(settings.WRITER_TIMEOUT):
+            succeeded, result = connection.recv()
+        else:
+            succeeded = None
+    except (OSError, EOFError):
+        succeeded = None
+
+    if succeeded is None:
+        connection.close()
+        local.connection = None
+
+        raise WriterError(f'Lost the result of {name}.')
+
+    if not succeeded:
+        raise result
+
+    return result
+
+
+class Writer:
+    def __init__(self, address, batch_size, delay):
+        self.address = address
+        self.batch_size = batch_size
+        self.delay = delay
+        self.commands = queue.Queue()
+
+    def serve(self, ready=None):
+        listener = Listener(self.address, 'AF_UNIX', authkey=get_authkey())
+        threading.Thread(target=self.accept, args=(listener,),
+                         daemon=True).start()
+
+        if ready is not None:
+            ready.set()
+
+        while True:
+            self.commit(self.collect())
+
+    def accept(self, listener):
+        while True:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as error:
+                logger.warning(f'Rejected a connection: {error}')
+                continue
+
+            threading.Thread(target=self.receive, args=(connection,),
+                             daemon=True).start()
+
+    def receive(self, connection):
+        try:
+            while True:
+                name, args = connection.recv()
+                self.commands.put((connection, name, args))
+        except (OSError, EOFError):
+            connection.close()
+
+    def collect(self):
+        batch = [self.commands.get()]
+        deadline = time.monotonic() + self.delay
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.commands.get(
+                    timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def commit(self, batch):
+        close_old_connections()
+        results = []
+
+        try:
+            with transaction.atomic():
+                for _, name, args in batch:
+                    # A failing command only rolls back its own savepoint
+                    try:
+                        with transaction.atomic():
+                            results.append((True, run_command(name, args)))
+                    except Exception as error:
+                        results.append((False, error))
+        except DatabaseError as error:
+            logger.error(f'Could not commit {len(batch)} commands: {error}')
+            results = [(False, error)] * len(batch)
+
+        for (connection, name, _), result in zip(batch, results):
+            try:
+                connection.send(result)
+            except OSError:
+                logger.warning(f'Could not return the result of {name}.')
+            except (pickle.PicklingError, AttributeError, TypeError):
+                connection.send((False, WriterError(str(result[1]))))
@@ -0,0 +1,22 @@
+"""
+ASGI config for coffee project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import dotenv
+
+dotenv.load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                '.env'))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffee.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+from django.core.asgi import get_asgi_application
+
+application = get_asgi_application()
@@ -23,7 +23,8 @@ from django_auth_ldap.config import LDAPSearch, PosixGroupType
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Static files are only served under their hashed names with DEBUG off
+DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = ['*']
 
@@ -41,6 +42,33 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# Adds a content hash to the file names and compresses them in collectstatic
+STATICFILES_STORAGE = 'chiffee.staticfiles.CompressedManifestStaticFilesStorage'
+
+
+# Cache (shared between all worker processes)
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(BASE_DIR, 'cache')}}
+
+
+# Shopping carts are kept out of the database, either in a signed cookie
+# (chiffee.cart.SignedCookieCartStore) or in the cache CART_CACHE
+# (chiffee.cart.CacheCartStore), and expire after CART_TIMEOUT seconds
+CART_STORE = 'chiffee.cart.SignedCookieCartStore'
+CART_CACHE = 'default'
+CART_TIMEOUT = 60 * 60 * 24
+
+
+# Metrics (shared between all worker processes through files in METRICS_DIR,
+# which has to be emptied whenever the server is restarted)
+METRICS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR',
+                        os.path.join(BASE_DIR, 'metrics'))
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = METRICS_DIR
+# Scrapers send it in an "Authorization: Bearer <token>" header, staff users
+# can read the metrics without it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 
 # Environment variables (imported from your .env file)
@@ -51,13 +79,6 @@ EMAIL_HOST = os.getenv('EMAIL_HOST')
 FILTERS_EMPTY_CHOICE_LABEL = ''
 
 
-# Settings for auto-resizing user-uploaded profile pictures
-DJANGORESIZED_DEFAULT_FORCE_FORMAT = 'JPEG'
-DJANGORESIZED_DEFAULT_FORMAT_EXTENSIONS = {'JPEG': '.jpg'}
-DJANGORESIZED_DEFAULT_QUALITY = 100
-DJANGORESIZED_DEFAULT_SIZE = [300, 300]
-
-
 # Auto-created fields
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -117,7 +138,20 @@ AUTH_LDAP_USER_FLAGS_BY_GROUP = {'is_staff': (f'{AUTH_LDAP_CN_ADMINS},'
 
 AUTH_LDAP_MIRROR_GROUPS = os.getenv('AUTH_LDAP_MIRROR_GROUPS').split(' ')
 
-AUTHENTICATION_BACKENDS = ['django_auth_ldap.backend.LDAPBackend',
+# Seconds after a successful login during which the user's groups, attributes
+# and password are not checked against the LDAP server again
+AUTH_LDAP_CACHE_TIMEOUT = int(os.getenv('AUTH_LDAP_CACHE_TIMEOUT', 900))
+
+# Seconds after a successful login during which the password is still accepted
+# while the LDAP server does not respond
+LDAP_OFFLINE_GRACE_PERIOD = int(os.getenv('LDAP_OFFLINE_GRACE_PERIOD',
+                                          7 * 24 * 60 * 60))
+LDAP_TIMEOUT = int(os.getenv('LDAP_TIMEOUT', 3))
+
+AUTH_LDAP_CONNECTION_OPTIONS = {ldap.OPT_NETWORK_TIMEOUT: LDAP_TIMEOUT,
+                                ldap.OPT_TIMEOUT: LDAP_TIMEOUT}
+
+AUTHENTICATION_BACKENDS = ['chiffee.ldapauth.CachedLDAPBackend',
                            'django.contrib.auth.backends.ModelBackend']
 
 
@@ -134,12 +168,14 @@ INSTALLED_APPS = ['django.contrib.admin',
                   'django_filters',
                   'django_resized']
 
-MIDDLEWARE = ['django.middleware.security.SecurityMiddleware',
+MIDDLEWARE = ['chiffee.metrics.MetricsMiddleware',
+              'django.middleware.security.SecurityMiddleware',
               'django.contrib.sessions.middleware.SessionMiddleware',
               'django.middleware.locale.LocaleMiddleware',
               'django.middleware.common.CommonMiddleware',
               'django.middleware.csrf.CsrfViewMiddleware',
               'django.contrib.auth.middleware.AuthenticationMiddleware',
+              'chiffee.cart.CartMiddleware',
               'django.contrib.messages.middleware.MessageMiddleware',
               'django.middleware.clickjacking.XFrameOptionsMiddleware']
 
@@ -155,6 +191,9 @@ TEMPLATES = [{'BACKEND': 'django.template.backends.django.DjangoTemplates',
                   'django.contrib.messages.context_processors.messages']}}]
 
 WSGI_APPLICATION = 'coffee.wsgi.application'
+ASGI_APPLICATION = 'coffee.asgi.application'
+# Serves the kiosk pages with async views, set by coffee/asgi.py
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
 
 
 # Database
@@ -162,6 +201,17 @@ WSGI_APPLICATION = 'coffee.wsgi.application'
 DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3',
                          'NAME': os.path.join(BASE_DIR, 'db.sqlite3')}}
 
+# Production profile for SQLite (WAL, tuned pragmas, persistent connections
+# and write transactions with BEGIN IMMEDIATE), see chiffee/sqlite3/base.py
+if os.getenv('SQLITE_PRODUCTION') == 'True':
+    DATABASES['default'].update({'ENGINE': 'chiffee.sqlite3',
+                                 'CONN_MAX_AGE': 600})
+
+# Optional single writer process (python manage.py runwriter) that commits
+# purchases, deposits and cancellations of all workers in groups
+WRITER_ADDRESS = os.getenv('WRITER_ADDRESS')
+WRITER_TIMEOUT = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -14,15 +14,21 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import re
+
 from django.conf.urls.i18n import i18n_patterns
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 
+from chiffee.staticfiles import serve_media, serve_static
 from coffee import settings
 
 urlpatterns = [
     path('', include(('chiffee.urls', 'chiffee'), namespace='chiffee'))]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$',
+            serve_media),
+    re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$',
+            serve_static)]
 urlpatterns += i18n_patterns(path('admin/', admin.site.urls))